@@ -686,6 +686,9 @@ int main() {
 
     bool is_tty = isatty(STDIN_FILENO);
 
+    // Bare sync marker line tells transcript-listener this binary echoes markers
+    if (!is_tty) std::cout << '\x1e' << std::endl;
+
     while (true) {
         std::string input;
 
@@ -706,6 +709,13 @@ int main() {
         if (input.empty()) continue;
         if (input == "exit" || input == "quit") break;
 
+        // Sync marker from transcript-listener: echo it back so the listener
+        // knows everything sent before it has been handled
+        if (input[0] == '\x1e') {
+            std::cout << input << std::endl;
+            continue;
+        }
+
         // Check for project context
         check_project_context(input);
         if (!active_project_dir.empty()) {
@@ -736,7 +746,7 @@ int main() {
             context.clear();
             active_project_dir = "";
             failed_commands.clear();
-            system("rm -f /root/agent-logs/*.json");
+            system("rm -f /root/agent-logs/*.json /root/agent-logs/*.jsonl");
             std::cout << GREEN << "[Context cleared]" << RESET << "\n";
             continue;
         }
@@ -563,8 +563,8 @@ int main(int argc, char* argv[]) {
             history.clear();
             active_project_dir = "";
             // Clear log files
-            system("rm -f /root/agent-logs/coding-history.json");
-            system("rm -f /root/agent-logs/main-history.json");
+            system("rm -f /root/agent-logs/coding-history.json /root/agent-logs/coding-history.jsonl");
+            system("rm -f /root/agent-logs/main-history.json /root/agent-logs/main-history.jsonl");
             std::cout << GREEN << "Context and logs cleared." << RESET << "\n";
             continue;
         }
@@ -578,8 +578,8 @@ int main(int argc, char* argv[]) {
                 history.clear();
                 active_project_dir = "";  // Also clear project context
                 // Clear log files
-                system("rm -f /root/agent-logs/coding-history.json");
-                system("rm -f /root/agent-logs/main-history.json");
+                system("rm -f /root/agent-logs/coding-history.json /root/agent-logs/coding-history.jsonl");
+                system("rm -f /root/agent-logs/main-history.json /root/agent-logs/main-history.jsonl");
                 std::cout << GREEN << "Context and logs cleared." << RESET << "\n";
                 continue;
             }
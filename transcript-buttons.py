@@ -3,17 +3,123 @@
 import gi
 gi.require_version('Gtk', '3.0')
 gi.require_version('GtkLayerShell', '0.1')
-from gi.repository import Gtk, Gdk, GLib, GtkLayerShell, Pango
+from gi.repository import Gtk, Gdk, Gio, GLib, GtkLayerShell, Pango
 import subprocess
+import http.client
+import json
+import mmap
 import os
+import re
+import select
 import signal
+import socket
+import tempfile
 import threading
+import time
+import traceback
+import wave
+import collections
+import concurrent.futures
+import fcntl
+import termios
+
+try:
+    import pynvml  # Optional: GPU stats without forking nvidia-smi
+except ImportError:
+    pynvml = None
+
+try:
+    import numpy
+    import soxr  # Optional: resample in-process instead of forking ffmpeg
+except ImportError:
+    soxr = None
+
+try:
+    import ijson  # Optional: pull the VL reply text out without parsing the whole response
+except ImportError:
+    ijson = None
+
+try:
+    import pybase64 as base64  # Optional: SIMD base64 encoder for screenshots
+except ImportError:
+    import base64
 
 WHISPER_CLI = "/root/workspace/whisper.cpp/build/bin/whisper-cli"
+# Resident whisper.cpp HTTP server, used instead of whisper-cli when installed
+WHISPER_SERVER = "/root/workspace/whisper.cpp/build/bin/whisper-server"
+WHISPER_PORT = 9092
 MODEL = "/root/workspace/whisper.cpp/models/ggml-small.bin"
 TRANSCRIPT_DIR = "/root/transcripts"
+LISTENER_LOCK = "/tmp/transcript-listener.lock"
+MAX_PROCESSING = 4  # Recordings in flight (2 running + 2 queued) before new ones are refused
+WHISPER_VRAM_NEEDED = 1 << 30  # Free VRAM (bytes) to wait for before running whisper
+
+# Vision model server for captures; started on first use and kept resident
+VL_PORT = 9091
+# llama-server listens on a UNIX socket when --host ends in .sock, which
+# skips the TCP loopback stack; set None to use VL_PORT instead
+VL_SOCKET = "/tmp/agent-os-vl.sock"
+VL_MODEL = os.path.expanduser("~/workspace/models/Qwen3-VL-8B-Instruct-Q8_0.gguf")
+MMPROJ = os.path.expanduser("~/workspace/models/mmproj-Qwen3VL-8B-Instruct-F16.gguf")
+# Seconds the VL server stays loaded after a capture. The listener restarts its
+# text model meanwhile, so both sit in VRAM for this long; 0 frees it right away
+VL_IDLE_SECS = 300
+
+VL_PROMPT = """Describe what you see in this image in detail.
+If it's code/terminal: describe the language, visible code, errors, file paths.
+If it's a UI: describe the elements, text, and layout.
+If it's something else: describe what you actually see.
+Be accurate - only describe what is truly visible."""
 
-def get_audio_device():
+# OpenAI-compatible chat completions request with a base64 data URL,
+# pre-encoded once as the bytes either side of the image so the base64
+# can be streamed in between (see process_capture_thread)
+_VL_IMAGE_MARK = "@@IMAGE@@"
+_VL_HEAD, _VL_TAIL = json.dumps({
+    "model": "gpt-4-vision-preview",
+    "messages": [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{_VL_IMAGE_MARK}"
+                    }
+                },
+                {
+                    "type": "text",
+                    "text": VL_PROMPT
+                }
+            ]
+        }
+    ],
+    "max_tokens": 1024,
+    "temperature": 0.3
+}).encode("utf-8").split(_VL_IMAGE_MARK.encode())
+VL_B64_CHUNK = 49152  # Multiple of 3, so no '=' padding mid-stream
+
+# Typed messages go to the listener over a pipe; set False to fall back to
+# writing main.txt (the listener watches that file either way)
+SEND_VIA_PIPE = True
+
+# Max 64 KiB reads drained from the listener pipe per main-loop wakeup
+LISTENER_MAX_READS = 16
+
+# System monitor label markup
+SYS_MARKUP = '<span font="monospace 8" foreground="#aaaaaa">%s</span>'
+SYS_ERR_MARKUP = '<span font="monospace 8" foreground="#ff6666">err</span>'
+
+# ANSI color / erase-line codes stripped from output before display.
+# Listener output is stripped as bytes, before it is decoded.
+ANSI_RE = re.compile(r'\x1b\[[0-9;]*[mK]')
+ANSI_BYTES_RE = re.compile(rb'\x1b\[[0-9;]*[mK]')
+
+# Resolved capture device, cached across widget restarts (hostname<TAB>device)
+AUDIO_DEVICE_CACHE = "/tmp/.agent-os-audio-device"
+AUDIO_DEVICE_CACHE_TTL = 3600  # seconds
+
+def _probe_audio_device():
     """Find Razer Kiyo or fallback to first capture device"""
     try:
         result = subprocess.run(["arecord", "-l"], capture_output=True, text=True)
@@ -27,8 +133,288 @@ def get_audio_device():
     except:
         return "plughw:0,0"
 
+def get_audio_device():
+    """Return the capture device, probing with arecord -l only on a cache miss"""
+    host = os.uname().nodename
+    try:
+        if time.time() - os.stat(AUDIO_DEVICE_CACHE).st_mtime < AUDIO_DEVICE_CACHE_TTL:
+            with open(AUDIO_DEVICE_CACHE) as f:
+                cached_host, _, device = f.read().strip().partition('\t')
+            if cached_host == host and device:
+                return device
+    except OSError:
+        pass
+
+    device = _probe_audio_device()
+    try:
+        with open(AUDIO_DEVICE_CACHE, 'w') as f:
+            f.write(f"{host}\t{device}\n")
+    except OSError:
+        pass
+    return device
+
 AUDIO_DEVICE = get_audio_device()
 
+def _find_pids(pattern):
+    """Return PIDs of processes whose command line contains pattern (like pgrep -f)
+
+    Scans /proc directly so finding llama-server/arecord doesn't fork pgrep.
+    """
+    needle = pattern.encode()
+    own_pid = os.getpid()
+    pids = []
+    for entry in os.scandir('/proc'):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry.name}/cmdline', 'rb') as f:
+                cmdline = f.read().replace(b'\0', b' ')
+        except OSError:
+            continue  # Exited while scanning, or not ours to read
+        pid = int(entry.name)
+        if needle in cmdline and pid != own_pid:
+            pids.append(pid)
+    return pids
+
+def _pkill(pattern, sig=signal.SIGTERM):
+    """Signal every process matching pattern, returning the PIDs signalled"""
+    pids = _find_pids(pattern)
+    for pid in pids:
+        try:
+            os.kill(pid, sig)
+        except OSError:
+            pass
+    return pids
+
+def _shared_group(pids):
+    """Process group shared by all pids, if one of them leads it; else None
+
+    Only then is killpg() known to target the servers' own group rather
+    than, say, the session of whatever launched them.
+    """
+    try:
+        groups = {os.getpgid(pid) for pid in pids}
+    except ProcessLookupError:
+        return None
+    if len(groups) == 1:
+        pgid = groups.pop()
+        if pgid in pids:
+            return pgid
+    return None
+
+def _wait_dead(pids, timeout_ms=1000):
+    """Wait for pids to exit via pidfd polling instead of a fixed sleep"""
+    poller = select.poll()
+    fds = []
+    try:
+        for pid in pids:
+            try:
+                fd = os.pidfd_open(pid)
+            except ProcessLookupError:
+                continue  # Already gone
+            except (AttributeError, OSError):
+                # No pidfd support (kernel < 5.3) - fall back to sleeping
+                time.sleep(timeout_ms / 1000)
+                return
+            fds.append(fd)
+            poller.register(fd, select.POLLIN)
+
+        deadline = time.monotonic() + timeout_ms / 1000
+        remaining = len(fds)
+        while remaining:
+            left_ms = int((deadline - time.monotonic()) * 1000)
+            if left_ms <= 0:
+                break
+            for fd, _ in poller.poll(left_ms):
+                poller.unregister(fd)
+                remaining -= 1
+    finally:
+        for fd in fds:
+            os.close(fd)
+
+class _Spawned:
+    """Minimal Popen-alike for a child started with os.posix_spawnp
+
+    posix_spawn uses vfork/CLONE_VM, so launching doesn't copy the page
+    tables of this (fairly large) GTK process like fork() does. stdio goes
+    to /dev/null and the child gets its own session.
+    """
+
+    _DEVNULL_ACTIONS = [
+        (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+        (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+        (os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY, 0),
+    ]
+
+    def __init__(self, args):
+        self.args = args
+        self.returncode = None
+        self.pid = os.posix_spawnp(args[0], args, os.environ,
+                                   file_actions=self._DEVNULL_ACTIONS, setsid=True)
+
+    def _reap(self, flags):
+        try:
+            pid, status = os.waitpid(self.pid, flags)
+        except ChildProcessError:
+            # Reaped elsewhere (e.g. a GLib child watch) - same as Popen
+            self.returncode = 0
+            return
+        if pid:
+            self.returncode = os.waitstatus_to_exitcode(status)
+
+    def poll(self):
+        if self.returncode is None:
+            self._reap(os.WNOHANG)
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            if timeout is None:
+                self._reap(0)
+            elif self.poll() is None:
+                self._wait_exit(timeout)
+                if self.poll() is None:
+                    raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def _wait_exit(self, timeout):
+        """Sleep until the child exits or timeout passes, without reaping it"""
+        try:
+            pidfd = os.pidfd_open(self.pid)
+        except ProcessLookupError:
+            return
+        except (AttributeError, OSError):
+            # No pidfd support (kernel < 5.3) - poll waitpid with backoff
+            deadline = time.monotonic() + timeout
+            delay = 0.001
+            while self.poll() is None and time.monotonic() < deadline:
+                time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+                delay = min(delay * 2, 0.05)
+            return
+        try:
+            # The pidfd becomes readable the moment the child exits
+            poller = select.poll()
+            poller.register(pidfd, select.POLLIN)
+            poller.poll(int(timeout * 1000))
+        finally:
+            os.close(pidfd)
+
+    def send_signal(self, sig):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection to a server listening on a UNIX domain socket"""
+
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+def _wait_healthy(conn, timeout=120, process=None):
+    """Poll GET /health on an HTTPConnection with exponential backoff (20 ms up to 500 ms)
+
+    The connection is reused between probes. Returns False on timeout, or
+    early if process exits first.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.02
+    while time.monotonic() < deadline:
+        try:
+            conn.request("GET", "/health")
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                return True
+        except (OSError, http.client.HTTPException):
+            conn.close()  # Not listening yet - reconnect on the next probe
+        if process is not None and process.poll() is not None:
+            return False  # Server died - don't wait out the full timeout
+        time.sleep(delay)
+        delay = min(delay * 1.5, 0.5)
+    return False
+
+def _completion_content(response):
+    """choices[0].message.content of an OpenAI chat completion response stream"""
+    try:
+        if ijson is not None:
+            # Incremental parse: stops at the content string, skips usage/timings etc.
+            return next(ijson.items(response, "choices.item.message.content"), None) or ""
+        result = json.load(response)
+        return result.get("choices", [{}])[0].get("message", {}).get("content", "")
+    finally:
+        response.read()  # Drain what's left so the kept-alive connection can be reused
+
+def _remove(*paths):
+    """Unlink each path, skipping None and files that are already gone"""
+    for path in paths:
+        if path:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+def _pipe_room(fd):
+    """Bytes that can be written to pipe fd right now without blocking"""
+    queued = int.from_bytes(fcntl.ioctl(fd, termios.FIONREAD, b"\0" * 4), "little")
+    return fcntl.fcntl(fd, getattr(fcntl, "F_GETPIPE_SZ", 1032)) - queued
+
+def _is_16k_mono(path):
+    """True if the WAV at path is already in whisper's 16 kHz mono 16-bit format"""
+    try:
+        with wave.open(path, "rb") as w:
+            return w.getframerate() == 16000 and w.getnchannels() == 1 and w.getsampwidth() == 2
+    except (OSError, EOFError, wave.Error):
+        return False
+
+def _resample_16k(src, dst):
+    """Convert a WAV to whisper's 16 kHz mono, in-process when soxr is available"""
+    if soxr is not None:
+        try:
+            with wave.open(src, "rb") as w:
+                rate, channels, width = w.getframerate(), w.getnchannels(), w.getsampwidth()
+                frames = w.readframes(w.getnframes())
+            if width == 2:
+                frames = frames[:len(frames) // (2 * channels) * 2 * channels]  # Drop a torn frame
+                pcm = numpy.frombuffer(frames, dtype=numpy.int16).reshape(-1, channels)
+                mono = pcm.mean(axis=1, dtype=numpy.float32)
+                out = soxr.resample(mono, rate, 16000, quality="HQ")
+                out = numpy.clip(out, -32768, 32767).astype(numpy.int16)
+                with wave.open(dst, "wb") as w:
+                    w.setnchannels(1)
+                    w.setsampwidth(2)
+                    w.setframerate(16000)
+                    w.writeframes(out.tobytes())
+                return
+        except (OSError, EOFError, ValueError, wave.Error):
+            pass  # Fall back to ffmpeg
+
+    subprocess.run(
+        ["ffmpeg", "-y", "-i", src, "-ar", "16000", "-ac", "1", dst],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        stdin=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
 class StatusWindow(Gtk.Window):
     def __init__(self):
         super().__init__()
@@ -42,25 +428,19 @@ class StatusWindow(Gtk.Window):
 
         self.label = Gtk.Label(label="Processing...")
 
-        css = Gtk.CssProvider()
-        css.load_from_data(b'''
-            window {
-                background: #333333;
-            }
-            label {
-                color: #ffaa00;
-                padding: 8px 12px;
-            }
-        ''')
-        Gtk.StyleContext.add_provider_for_screen(
-            Gdk.Screen.get_default(),
-            css,
-            Gtk.STYLE_PROVIDER_PRIORITY_USER
-        )
+        # Styled by the .status rules in TranscriptButtons._setup_css
+        self.get_style_context().add_class("status")
+        self.label.get_style_context().add_class("status")
 
         self.add(self.label)
 
 class TranscriptButtons(Gtk.Window):
+    # Repetitive listener messages, shown only once in a row
+    _SKIP_EXACT = frozenset({">>>", "[Thinking...]", ">>> [Thinking...]", ">>> >>> [Thinking...]",
+                             "Unknown command", ">>> Unknown command"})
+    # Matches a line containing any of the above
+    _SKIP_RE = re.compile(r'>>>|\[Thinking\.\.\.\]|Unknown command')
+
     def __init__(self):
         super().__init__()
 
@@ -82,6 +462,35 @@ class TranscriptButtons(Gtk.Window):
 
     def _setup_css(self):
         """Load CSS before widgets are created"""
+        # Button colors (unified agent: no separate coding button)
+        self.colors = {
+            "main": "#ff0000",
+            "capture": "#0000ff",
+            "recording": "#ffff00",
+            "claude_on": "#9933ff",   # Purple when Claude enabled
+            "claude_off": "#666666",  # Gray when Claude disabled
+            "restart": "#444444",
+            "send": "#00aa00",
+        }
+
+        # One style class per color, so recoloring a button is a class swap
+        self._color_classes = {}
+        button_css = []
+        for name, color in self.colors.items():
+            cls = f"color-{name.replace('_', '-')}"
+            text_color = "black" if color in ["#00ff00", "#ffff00"] else "white"
+            self._color_classes[color] = cls
+            button_css.append(f'''
+            button.{cls} {{
+                background: {color};
+                background-image: none;
+                color: {text_color};
+                border: none;
+                border-radius: 4px;
+                padding: 8px 12px;
+                margin: 4px;
+            }}''')
+
         self._global_css = Gtk.CssProvider()
         self._global_css.load_from_data(b'''
             textview, textview text {
@@ -111,7 +520,14 @@ class TranscriptButtons(Gtk.Window):
             label {
                 font-size: 9pt;
             }
-        ''')
+            window.status {
+                background: #333333;
+            }
+            label.status {
+                color: #ffaa00;
+                padding: 8px 12px;
+            }
+        ''' + ''.join(button_css).encode())
         Gtk.StyleContext.add_provider_for_screen(
             Gdk.Screen.get_default(),
             self._global_css,
@@ -130,6 +546,10 @@ class TranscriptButtons(Gtk.Window):
         self.temp_wav = None
         self.processing_count = 0
         self.status_window = None
+        # Transcription/capture jobs run on daemon threads (so closing or restarting
+        # the widget never waits on one); at most two run at once so GPU jobs can't pile up
+        self.job_slots = threading.BoundedSemaphore(2)
+        self.jobs = set()  # Futures of jobs not finished yet
 
         # Capture state
         self.capture_recording = None
@@ -140,15 +560,6 @@ class TranscriptButtons(Gtk.Window):
         # Claude mode toggle
         self.use_claude = False
 
-        # Button colors (unified agent: no separate coding button)
-        self.colors = {
-            "main": "#ff0000",
-            "capture": "#0000ff",
-            "recording": "#ffff00",
-            "claude_on": "#9933ff",   # Purple when Claude enabled
-            "claude_off": "#666666",  # Gray when Claude disabled
-        }
-
         # Main container with fixed width
         main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
         main_box.set_size_request(390, -1)  # Fixed width to prevent resizing
@@ -161,29 +572,39 @@ class TranscriptButtons(Gtk.Window):
         # User can say "project /path" via voice to set coding context
         btn_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=4)
 
+        # Button states: state -> (color key, label), applied in one call
+        self.button_states = {
+            "main": ("main", "Command"),
+            "main_recording": ("recording", "Command"),
+            "capture": ("capture", "Capture"),
+            "capture_recording": ("recording", "Capture"),
+            "claude_on": ("claude_on", "CLAUDE"),
+            "claude_off": ("claude_off", "Clau$e"),
+        }
+
         self.btn_main = Gtk.Button(label="Command")
         self.btn_capture = Gtk.Button(label="Capture")
 
         self.buttons = {
-            "main": (self.btn_main, "main.txt", self.colors["main"]),
-            "capture": (self.btn_capture, "capture.txt", self.colors["capture"])
+            "main": (self.btn_main, "main.txt"),
+            "capture": (self.btn_capture, "capture.txt")
         }
 
-        for name, (btn, filename, color) in self.buttons.items():
-            self.set_button_color(btn, color)
+        for name, (btn, filename) in self.buttons.items():
+            self._apply_state(btn, name)
             btn.connect("clicked", self.on_button_clicked, name, filename)
             btn_box.pack_start(btn, True, True, 0)
 
         # Claude toggle button
         self.btn_claude = Gtk.Button(label="Clau$e")
-        self.set_button_color(self.btn_claude, self.colors["claude_off"])
+        self._apply_state(self.btn_claude, "claude_off")
         self.btn_claude.connect("clicked", self.on_claude_toggle)
         btn_box.pack_start(self.btn_claude, True, True, 0)
 
         # Restart button (small with refresh icon)
         self.btn_restart = Gtk.Button(label="⟳")
         self.btn_restart.set_size_request(30, -1)  # Small width
-        self.set_button_color(self.btn_restart, "#444444")
+        self.set_button_color(self.btn_restart, self.colors["restart"])
         self.btn_restart.connect("clicked", self.on_restart)
         btn_box.pack_start(self.btn_restart, False, False, 0)
 
@@ -191,7 +612,8 @@ class TranscriptButtons(Gtk.Window):
 
         # System monitor label
         self.sys_label = Gtk.Label()
-        self.sys_label.set_markup('<span font="monospace 8" foreground="#aaaaaa">...</span>')
+        self._last_sys_markup = SYS_MARKUP % "..."
+        self.sys_label.set_markup(self._last_sys_markup)
         self.sys_label.set_xalign(0)
         main_box.pack_start(self.sys_label, False, False, 0)
 
@@ -212,10 +634,19 @@ class TranscriptButtons(Gtk.Window):
         self.output_scroll.add(self.output_view)
         main_box.pack_start(self.output_scroll, True, True, 0)  # expand=True to fill vertical space
 
-        # Output line buffer for smooth updates
-        self.output_lines = []
+        # Output is appended incrementally; only the line count and last line are tracked
+        self.output_line_count = 0
+        self.last_output_line = ""
         self.max_output_lines = 500  # Keep last 500 lines
         self.auto_scroll = True  # Track if we should auto-scroll
+        self._scroll_pending = False  # At most one scroll_to_bottom queued at a time
+        self._scrolling_programmatically = False
+
+        # Lines queued from background threads, flushed in one idle callback.
+        # Bounded like the view, so a burst never queues more than can be shown.
+        self._pending = collections.deque(maxlen=self.max_output_lines)
+        self._pending_lock = threading.Lock()
+        self._flush_scheduled = False
 
         # Detect when user scrolls away from bottom
         vadj = self.output_scroll.get_vadjustment()
@@ -233,7 +664,7 @@ class TranscriptButtons(Gtk.Window):
 
         self.btn_send = Gtk.Button(label="▶")
         self.btn_send.set_size_request(40, -1)
-        self.set_button_color(self.btn_send, "#00aa00")
+        self.set_button_color(self.btn_send, self.colors["send"])
         self.btn_send.connect("clicked", self.on_send_message)
         input_box.pack_start(self.btn_send, False, False, 0)
 
@@ -241,22 +672,54 @@ class TranscriptButtons(Gtk.Window):
 
         self.add(main_box)
 
+        # Keep /proc stat files open; each tick re-reads them with one pread()
+        self._stat_fd = os.open('/proc/stat', os.O_RDONLY)
+        self._meminfo_fd = os.open('/proc/meminfo', os.O_RDONLY)
+        self._last_cpu = None  # (total, idle) from the previous tick
+
+        # NVML handle for GPU stats; None means fall back to nvidia-smi
+        self._gpu = None
+        if pynvml:
+            try:
+                pynvml.nvmlInit()
+                self._gpu = pynvml.nvmlDeviceGetHandleByIndex(0)
+            except pynvml.NVMLError:
+                pass
+
         # Start system monitor update
         GLib.timeout_add(2000, self.update_system_stats)
 
+        # llama-server pids as (monotonic scan time, pids, shared pgid), see _get_llama_pids
+        self._llama_pids_cache = (0.0, [], None)
+
+        # Resident VL server (see _ensure_vl_server); one capture request at a time
+        self.vl_process = None
+        self._vl_used_at = 0.0  # time.monotonic() when the last capture finished with it
+        if VL_SOCKET:
+            self.vl_conn = _UnixHTTPConnection(VL_SOCKET, timeout=180)  # Kept alive
+        else:
+            self.vl_conn = http.client.HTTPConnection("localhost", VL_PORT, timeout=180)
+        self._vl_lock = threading.Lock()
+        self.connect("destroy", self.on_destroy)
+
+        # Keep the whisper model loaded between recordings when whisper-server exists
+        self.whisper_server = None
+        if os.access(WHISPER_SERVER, os.X_OK):
+            _wait_dead(_pkill("whisper-server"), 1000)
+            self.whisper_server = _Spawned(
+                [WHISPER_SERVER, "-m", MODEL, "-ng", "-t", "4", "--port", str(WHISPER_PORT)]
+            )
+
         # Start transcript listener as subprocess
         self.start_listener()
 
     def on_claude_toggle(self, button):
         """Toggle between local LLM and Claude Code"""
         self.use_claude = not self.use_claude
+        self._apply_state(self.btn_claude, "claude_on" if self.use_claude else "claude_off")
         if self.use_claude:
-            self.set_button_color(self.btn_claude, self.colors["claude_on"])
-            self.btn_claude.set_label("CLAUDE")
             self.append_output("[*] Claude mode ENABLED")
         else:
-            self.set_button_color(self.btn_claude, self.colors["claude_off"])
-            self.btn_claude.set_label("Clau$e")
             self.append_output("[*] Claude mode DISABLED")
 
     def on_input_clicked(self, widget, event):
@@ -283,12 +746,77 @@ class TranscriptButtons(Gtk.Window):
             transcript_file = os.path.join(TRANSCRIPT_DIR, "main.txt")
             content = text
 
-        # Write to transcript file (listener will pick it up)
-        with open(transcript_file, 'w') as f:
-            f.write(content)
+        # Send over the listener pipe, or write the transcript file as before
+        if not self.send_to_listener(content):
+            with open(transcript_file, 'w') as f:
+                f.write(content)
 
         self.append_output(f"[>] Sent: {text[:50]}...")
 
+    def send_to_listener(self, content):
+        """Write one message to the listener pipe, False if it can't be used
+
+        Messages are framed as one JSON object per line so multi-line content
+        (e.g. capture results) survives the trip intact.
+        """
+        data = (json.dumps({"text": content}) + '\n').encode()
+        with self._send_lock:  # Capture thread and main loop both send
+            if self._send_fd is None:
+                return False
+            try:
+                # The pipe is non-blocking so a listener that isn't reading yet
+                # (still starting its LLM server) can't freeze the UI. Only a
+                # message that fits whole is written, so none is ever torn.
+                if _pipe_room(self._send_fd) < len(data):
+                    raise BlockingIOError
+                while data:
+                    data = data[os.write(self._send_fd, data):]
+                return True
+            except BlockingIOError:
+                self.log("[!] Listener pipe full - writing main.txt instead")
+                return False
+            except OSError:
+                # Listener gone - stop using the pipe
+                os.close(self._send_fd)
+                self._send_fd = None
+                return False
+
+    def submit_job(self, fn, *args):
+        """Run fn(*args) on a daemon thread once a job slot is free; returns its future"""
+        future = concurrent.futures.Future()
+
+        def run():
+            with self.job_slots:
+                if not future.set_running_or_notify_cancel():
+                    return  # Cancelled while waiting for a slot
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+
+        self.jobs.add(future)
+        future.add_done_callback(self._job_done)
+        threading.Thread(target=run, daemon=True, name=fn.__name__).start()
+        return future
+
+    def _job_done(self, future):
+        """Report a job that raised instead of letting the exception vanish"""
+        self.jobs.discard(future)
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            tb = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+            self.log(f"[!] Job failed: {exc}\n{tb}")
+
+    def on_destroy(self, widget):
+        """Drop queued jobs and stop the resident VL and whisper servers with the widget"""
+        for future in list(self.jobs):
+            future.cancel()  # Only succeeds for jobs still waiting for a slot
+        for server in (self.vl_process, self.whisper_server):
+            if server and server.poll() is None:
+                server.terminate()
+
     def on_restart(self, button):
         """Restart everything including this widget"""
         self.append_output("[*] Restarting everything...")
@@ -301,12 +829,15 @@ class TranscriptButtons(Gtk.Window):
             except:
                 pass
 
-        # Kill any orphaned processes
-        subprocess.run(["pkill", "-9", "-f", "transcript-listener"], stderr=subprocess.DEVNULL)
-        subprocess.run(["pkill", "-9", "-f", "llama-server"], stderr=subprocess.DEVNULL)
-        subprocess.run(["pkill", "-9", "-f", "arecord"], stderr=subprocess.DEVNULL)
-        subprocess.run(["pkill", "-9", "-f", "whisper-cli"], stderr=subprocess.DEVNULL)
-        subprocess.run(["rm", "-f", "/tmp/transcript-listener.lock"], stderr=subprocess.DEVNULL)
+        # Kill any orphaned processes and wait until they are really gone
+        pids = []
+        for pattern in ("transcript-listener", "llama-server", "arecord", "whisper-cli", "whisper-server"):
+            pids += _pkill(pattern, signal.SIGKILL)
+        _wait_dead(pids, 1000)
+        _remove(LISTENER_LOCK)
+
+        # Re-probe the audio device on the next start (it may have been replugged)
+        _remove(AUDIO_DEVICE_CACHE)
 
         # Spawn new instance of buttons widget, then exit
         subprocess.Popen(
@@ -327,42 +858,82 @@ class TranscriptButtons(Gtk.Window):
         self.listener_process = None
 
         # Kill any existing listener
-        subprocess.run(["pkill", "-f", "transcript-listener"], stderr=subprocess.DEVNULL)
-        subprocess.run(["rm", "-f", "/tmp/transcript-listener.lock"], stderr=subprocess.DEVNULL)
+        _wait_dead(_pkill("transcript-listener"), 1000)
+        _remove(LISTENER_LOCK)
 
         # Start listener with unbuffered output
         env = os.environ.copy()
         env["PYTHONUNBUFFERED"] = "1"
 
+        # Pipe for typed messages; the listener learns the read end from its env
+        self._send_fd = None
+        self._send_lock = threading.Lock()
+        pass_fds = ()
+        if SEND_VIA_PIPE:
+            read_fd, self._send_fd = os.pipe2(os.O_CLOEXEC | os.O_NONBLOCK)
+            env["AGENT_OS_SEND_FD"] = str(read_fd)
+            pass_fds = (read_fd,)
+
         self.listener_process = subprocess.Popen(
             ["python3", "-u", "/root/workspace/agent-os/transcript-listener.py"],
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             stdin=subprocess.DEVNULL,
             env=env,
+            pass_fds=pass_fds,
             start_new_session=True
         )
+        if pass_fds:
+            os.close(read_fd)
 
-        # Start thread to read listener output
-        self.listener_thread = threading.Thread(target=self.read_listener_output, daemon=True)
-        self.listener_thread.start()
+        # Read listener output from the main loop - no reader thread needed
+        fd = self.listener_process.stdout.fileno()
+        os.set_blocking(fd, False)
+        self._listener_partial = b''
+        GLib.unix_fd_add_full(GLib.PRIORITY_DEFAULT, fd,
+                              GLib.IOCondition.IN | GLib.IOCondition.HUP,
+                              self.on_listener_readable)
 
         self.append_output("[*] Listener started")
 
-    def read_listener_output(self):
-        """Read output from listener process and append to text view"""
-        try:
-            for line in iter(self.listener_process.stdout.readline, b''):
-                if line:
-                    text = line.decode('utf-8', errors='replace').rstrip()
-                    GLib.idle_add(self.append_output, text)
-        except Exception as e:
-            GLib.idle_add(self.append_output, f"[!] Listener error: {e}")
+    def on_listener_readable(self, fd, condition):
+        """Drain available listener output and append complete lines in one batch"""
+        # Read until the pipe is empty (bounded so a flood can't starve the UI)
+        chunks = [self._listener_partial]
+        eof = False
+        for _ in range(LISTENER_MAX_READS):
+            try:
+                chunk = os.read(fd, 65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                self.append_output(f"[!] Listener error: {e}")
+                return False
+            if not chunk:
+                eof = True
+                break
+            chunks.append(chunk)
+        data = b''.join(chunks)
+
+        if eof:
+            # Listener exited - flush everything including a trailing partial line
+            self._listener_partial = b''
+            if data:
+                text = ANSI_BYTES_RE.sub(b'', data).decode('utf-8', errors='replace')
+                self._append_lines([line.rstrip() for line in text.split('\n')])
+            return False
+
+        # Carry an incomplete last line over to the next wakeup
+        complete, sep, self._listener_partial = data.rpartition(b'\n')
+        if sep:
+            text = ANSI_BYTES_RE.sub(b'', complete).decode('utf-8', errors='replace')
+            self._append_lines([line.rstrip() for line in text.split('\n')])
+        return True
 
     def on_scroll_changed(self, adj):
         """Track if user is at bottom of scroll"""
         # Don't update during programmatic scrolling
-        if getattr(self, '_scrolling_programmatically', False):
+        if self._scrolling_programmatically:
             return
         # Check if scrolled to bottom (with small tolerance)
         at_bottom = adj.get_value() >= adj.get_upper() - adj.get_page_size() - 20
@@ -374,60 +945,92 @@ class TranscriptButtons(Gtk.Window):
         adj = self.output_scroll.get_vadjustment()
         adj.set_value(adj.get_upper() - adj.get_page_size())
         self._scrolling_programmatically = False
+        self._scroll_pending = False
         return False  # For GLib.idle_add
 
     def append_output(self, text):
-        """Append text to output buffer (thread-safe via GLib.idle_add)"""
-        # Strip ANSI codes for cleaner display
-        import re
-        text = re.sub(r'\x1b\[[0-9;]*m', '', text)
-
-        # Skip empty lines and repetitive/spam messages
-        text_stripped = text.strip()
-        if not text_stripped:
-            return False
+        """Append a line to the output buffer (main thread only)"""
+        self._append_lines([ANSI_RE.sub('', text)])
+        return False  # For GLib.idle_add
 
-        # Skip repetitive messages
-        skip_patterns = [">>>", "[Thinking...]", ">>> [Thinking...]", ">>> >>> [Thinking...]",
-                        "Unknown command", ">>> Unknown command"]
-        if text_stripped in skip_patterns:
-            # Only show once if last line was similar
-            if self.output_lines:
-                last = self.output_lines[-1].strip()
-                if any(p in last for p in skip_patterns):
-                    return False
+    def _queue_output(self, text):
+        """Queue a line for the next idle flush (safe from any thread)"""
+        with self._pending_lock:
+            self._pending.append(text)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        GLib.idle_add(self._flush_pending)
+
+    def _flush_pending(self):
+        """Drain all queued lines into the buffer at once"""
+        with self._pending_lock:
+            lines = list(self._pending)
+            self._pending.clear()
+            self._flush_scheduled = False
+        self._append_lines([ANSI_RE.sub('', text) for text in lines])
+        return False  # For GLib.idle_add
+
+    def _append_lines(self, lines):
+        """Filter ANSI-free lines and append the survivors with a single buffer insert"""
+        accepted = []
+        last_line = self.last_output_line
+        for text in lines:
+            # Skip empty lines and repetitive/spam messages
+            text_stripped = text.strip()
+            if not text_stripped:
+                continue
+            if text_stripped in self._SKIP_EXACT:
+                # Only show once if last line was similar
+                if last_line and self._SKIP_RE.search(last_line):
+                    continue
+            accepted.append(text)
+            last_line = text
+
+        if not accepted:
+            return
 
         # Check if at bottom BEFORE adding text
         adj = self.output_scroll.get_vadjustment()
         was_at_bottom = adj.get_value() >= adj.get_upper() - adj.get_page_size() - 20
 
-        self.output_lines.append(text)
-        if len(self.output_lines) > self.max_output_lines:
-            self.output_lines = self.output_lines[-self.max_output_lines:]
-
-        self.output_buffer.set_text('\n'.join(self.output_lines))
+        # Insert at the end instead of re-uploading the whole transcript
+        chunk = '\n'.join(accepted)
+        end = self.output_buffer.get_end_iter()
+        if self.output_line_count:
+            self.output_buffer.insert(end, '\n' + chunk)
+        else:
+            self.output_buffer.insert(end, chunk)
+        self.output_line_count += chunk.count('\n') + 1
+        self.last_output_line = last_line
+
+        # Drop the oldest lines once over the limit
+        if self.output_line_count > self.max_output_lines:
+            trim_n = self.output_line_count - self.max_output_lines
+            start = self.output_buffer.get_start_iter()
+            cut = self.output_buffer.get_iter_at_line(trim_n)
+            self.output_buffer.delete(start, cut)
+            self.output_line_count -= trim_n
 
         # Only auto-scroll if user WAS at bottom before new text
-        if was_at_bottom:
+        if was_at_bottom and not self._scroll_pending:
+            self._scroll_pending = True
             GLib.idle_add(self.scroll_to_bottom)
 
-        return False  # For GLib.idle_add
-
     def log(self, text):
         """Thread-safe logging to output area"""
-        GLib.idle_add(self.append_output, text)
+        self._queue_output(text)
 
     def update_system_stats(self):
         """Update system stats display"""
         try:
             # CPU usage
-            with open('/proc/stat', 'r') as f:
-                cpu_line = f.readline()
-            cpu_parts = cpu_line.split()[1:5]
+            buf = os.pread(self._stat_fd, 256, 0)
+            cpu_parts = buf.split(b'\n', 1)[0].split()[1:5]
             cpu_total = sum(int(x) for x in cpu_parts)
             cpu_idle = int(cpu_parts[3])
 
-            if hasattr(self, '_last_cpu'):
+            if self._last_cpu is not None:
                 total_diff = cpu_total - self._last_cpu[0]
                 idle_diff = cpu_idle - self._last_cpu[1]
                 cpu_pct = 100 * (1 - idle_diff / max(total_diff, 1))
@@ -436,30 +1039,21 @@ class TranscriptButtons(Gtk.Window):
             self._last_cpu = (cpu_total, cpu_idle)
 
             # Memory usage
-            with open('/proc/meminfo', 'r') as f:
-                mem_lines = f.readlines()[:3]
+            buf = os.pread(self._meminfo_fd, 512, 0)
+            mem_lines = buf.split(b'\n', 3)[:3]
             mem_total = int(mem_lines[0].split()[1]) / 1024 / 1024  # GB
             mem_avail = int(mem_lines[2].split()[1]) / 1024 / 1024  # GB
             mem_used = mem_total - mem_avail
             mem_pct = 100 * mem_used / mem_total
 
-            # GPU usage (nvidia-smi) - show both compute activity and VRAM
-            try:
-                result = subprocess.run(
-                    ['nvidia-smi', '--query-gpu=utilization.gpu,memory.used,memory.total', '--format=csv,noheader,nounits'],
-                    capture_output=True, text=True, timeout=1
-                )
-                if result.returncode == 0:
-                    parts = result.stdout.strip().split(', ')
-                    gpu_compute = int(parts[0])  # Compute activity % (spikes during inference)
-                    gpu_mem_used = int(parts[1]) / 1024  # GB
-                    gpu_mem_total = int(parts[2]) / 1024  # GB
-                    vram_pct = 100 * gpu_mem_used / gpu_mem_total
-                    # Show compute% and VRAM usage
-                    gpu_str = f"GPU:{gpu_compute:3d}% VRAM:{gpu_mem_used:.1f}/{gpu_mem_total:.0f}G({vram_pct:.0f}%)"
-                else:
-                    gpu_str = ""
-            except:
+            # GPU usage - show both compute activity and VRAM
+            gpu = self.read_gpu_stats()
+            if gpu:
+                gpu_compute, gpu_mem_used, gpu_mem_total = gpu
+                vram_pct = 100 * gpu_mem_used / gpu_mem_total
+                # Show compute% and VRAM usage
+                gpu_str = f"GPU:{gpu_compute:3d}% VRAM:{gpu_mem_used:.1f}/{gpu_mem_total:.0f}G({vram_pct:.0f}%)"
+            else:
                 gpu_str = ""
 
             # Format display
@@ -467,31 +1061,58 @@ class TranscriptButtons(Gtk.Window):
             if gpu_str:
                 stats += f" {gpu_str}"
 
-            self.sys_label.set_markup(f'<span font="monospace 8" foreground="#aaaaaa">{stats}</span>')
+            markup = SYS_MARKUP % stats
         except Exception as e:
-            self.sys_label.set_markup(f'<span font="monospace 8" foreground="#ff6666">err</span>')
+            markup = SYS_ERR_MARKUP
+
+        # Skip the Pango re-parse when the display hasn't changed
+        if markup != self._last_sys_markup:
+            self._last_sys_markup = markup
+            self.sys_label.set_markup(markup)
 
         return True  # Keep timer running
 
+    def read_gpu_stats(self):
+        """Return (compute %, VRAM used GB, VRAM total GB), or None if unavailable"""
+        if self._gpu is not None:
+            try:
+                util = pynvml.nvmlDeviceGetUtilizationRates(self._gpu).gpu
+                mem = pynvml.nvmlDeviceGetMemoryInfo(self._gpu)
+                return util, mem.used / 1024 ** 3, mem.total / 1024 ** 3
+            except pynvml.NVMLError:
+                return None
+
+        # No NVML - shell out to nvidia-smi
+        try:
+            result = subprocess.run(
+                ['nvidia-smi', '--query-gpu=utilization.gpu,memory.used,memory.total', '--format=csv,noheader,nounits'],
+                capture_output=True, text=True, timeout=1
+            )
+            if result.returncode != 0:
+                return None
+            parts = result.stdout.strip().split(', ')
+            gpu_compute = int(parts[0])  # Compute activity % (spikes during inference)
+            gpu_mem_used = int(parts[1]) / 1024  # GB
+            gpu_mem_total = int(parts[2]) / 1024  # GB
+            return gpu_compute, gpu_mem_used, gpu_mem_total
+        except:
+            return None
+
     def set_button_color(self, btn, color):
-        css = Gtk.CssProvider()
-        text_color = "black" if color in ["#00ff00", "#ffff00"] else "white"
-        css.load_from_data(f'''
-            button {{
-                background: {color};
-                background-image: none;
-                color: {text_color};
-                border: none;
-                border-radius: 4px;
-                padding: 8px 12px;
-                margin: 4px;
-            }}
-        '''.encode())
+        """Recolor a button by swapping its prebuilt color style class"""
         ctx = btn.get_style_context()
-        for provider in getattr(btn, '_css_providers', []):
-            ctx.remove_provider(provider)
-        btn._css_providers = [css]
-        ctx.add_provider(css, Gtk.STYLE_PROVIDER_PRIORITY_USER)
+        old_class = getattr(btn, '_color_class', None)
+        if old_class:
+            ctx.remove_class(old_class)
+        btn._color_class = self._color_classes[color]
+        ctx.add_class(btn._color_class)
+
+    def _apply_state(self, btn, state):
+        """Set a button's color and label from the button_states table"""
+        color_key, label = self.button_states[state]
+        self.set_button_color(btn, self.colors[color_key])
+        if btn.get_label() != label:
+            btn.set_label(label)
 
     def show_status(self):
         if self.status_window is None:
@@ -513,73 +1134,98 @@ class TranscriptButtons(Gtk.Window):
         # Capture button: first click = screenshot + record, second click = stop
         if name == "capture":
             if not self.capture_recording:
+                if self._busy():
+                    return
                 self.start_capture(button)
             else:
                 self.stop_capture()
             return
 
         if self.recording_process is None:
+            if self._busy():
+                return
             self.start_recording(button, name, filename)
         elif self.current_button == button:
             self.stop_recording()
 
+    def _busy(self):
+        """True (and say so) if too many recordings are still being processed"""
+        if self.processing_count >= MAX_PROCESSING:
+            self.append_output(f"[!] Still processing {self.processing_count} recordings - try again shortly")
+            return True
+        return False
+
     def start_capture(self, button):
         """Take screenshot then start recording audio"""
-        self.set_button_color(button, self.colors["recording"])
+        self._apply_state(button, "capture_recording")
         self.capture_button = button
         self.capture_use_claude = self.use_claude  # Capture claude mode state
 
-        # Take screenshot first (in thread to not block UI)
-        thread = threading.Thread(target=self.capture_screenshot_thread)
-        thread.daemon = True
-        thread.start()
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+            self.capture_screenshot_path = f.name
+        self.append_output(f"[capture] Screenshot path: {self.capture_screenshot_path}")
 
-    def capture_screenshot_thread(self):
-        """Take screenshot, then start audio recording"""
-        import tempfile
+        # Region select + screenshot run as async Gio subprocesses; their
+        # completion callbacks run on the main loop, so no thread is needed
+        self.append_output("[capture] Running slurp...")
+        try:
+            slurp = Gio.Subprocess.new(["slurp"], Gio.SubprocessFlags.STDOUT_PIPE)
+        except GLib.Error as e:
+            self.fail_capture(f"[capture] Error: {e.message}")
+            return
+        slurp.communicate_utf8_async(None, None, self.on_slurp_done)
 
-        # Take screenshot
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
-            self.capture_screenshot_path = f.name
-        self.log(f"[capture] Screenshot path: {self.capture_screenshot_path}")
+    def on_slurp_done(self, slurp, result):
+        """Region selected (or cancelled) - take the screenshot with grim"""
+        try:
+            _, stdout, _ = slurp.communicate_utf8_finish(result)
+        except GLib.Error as e:
+            self.fail_capture(f"[capture] Error: {e.message}")
+            return
+        if not slurp.get_successful():
+            # User cancelled with Esc
+            status = slurp.get_exit_status() if slurp.get_if_exited() else -slurp.get_term_sig()
+            self.fail_capture(f"[capture] slurp cancelled/failed: {status}")
+            return
 
+        region = stdout.strip()
+        self.append_output(f"[capture] Region: {region}")
         try:
-            self.log("[capture] Running slurp...")
-            result = subprocess.run(["slurp"], capture_output=True, text=True)
-            if result.returncode != 0:
-                # User cancelled with Esc
-                self.log(f"[capture] slurp cancelled/failed: {result.returncode}")
-                if os.path.exists(self.capture_screenshot_path):
-                    os.unlink(self.capture_screenshot_path)
-                self.capture_screenshot_path = None
-                GLib.idle_add(self.cancel_capture)
-                return
-            region = result.stdout.strip()
-            self.log(f"[capture] Region: {region}")
-            subprocess.run(["grim", "-g", region, self.capture_screenshot_path], check=True)
-            self.log(f"[capture] Screenshot saved: {os.path.exists(self.capture_screenshot_path)}")
-        except Exception as e:
-            # Failed to capture
-            self.log(f"[capture] Error: {e}")
-            if self.capture_screenshot_path and os.path.exists(self.capture_screenshot_path):
-                os.unlink(self.capture_screenshot_path)
-            self.capture_screenshot_path = None
-            GLib.idle_add(self.cancel_capture)
+            # JPEG keeps the VL payload (and its base64 encode) several times smaller than PNG
+            grim = Gio.Subprocess.new(["grim", "-t", "jpeg", "-q", "85", "-g", region,
+                                       self.capture_screenshot_path],
+                                      Gio.SubprocessFlags.NONE)
+        except GLib.Error as e:
+            self.fail_capture(f"[capture] Error: {e.message}")
             return
+        grim.wait_check_async(None, self.on_grim_done)
+
+    def on_grim_done(self, grim, result):
+        """Screenshot taken - start audio recording"""
+        try:
+            grim.wait_check_finish(result)
+        except GLib.Error as e:
+            self.fail_capture(f"[capture] Error: {e.message}")
+            return
+        self.append_output(f"[capture] Screenshot saved: {os.path.exists(self.capture_screenshot_path)}")
 
         # Start audio recording
         self.capture_audio_path = tempfile.mktemp(suffix=".wav")
-        self.capture_recording = subprocess.Popen(
-            ["arecord", "-D", AUDIO_DEVICE, "-f", "cd", self.capture_audio_path],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            stdin=subprocess.DEVNULL,
-            start_new_session=True
+        self.capture_recording = _Spawned(
+            ["arecord", "-D", AUDIO_DEVICE, "-f", "S16_LE", "-r", "16000", "-c", "1",
+             self.capture_audio_path]
         )
 
+    def fail_capture(self, message):
+        """Log why the screenshot step failed, drop the screenshot and reset"""
+        self.append_output(message)
+        _remove(self.capture_screenshot_path)
+        self.capture_screenshot_path = None
+        self.cancel_capture()
+
     def cancel_capture(self):
         """Cancel capture and reset button"""
-        self.set_button_color(self.capture_button, self.colors["capture"])
+        self._apply_state(self.capture_button, "capture")
         self.capture_button = None
         self.capture_recording = None
         self.capture_screenshot_path = None
@@ -590,19 +1236,11 @@ class TranscriptButtons(Gtk.Window):
         """Stop recording and process capture"""
         self.log(f"[capture] stop_capture called, recording={self.capture_recording is not None}")
         if self.capture_recording:
-            try:
-                self.capture_recording.send_signal(signal.SIGINT)
-                self.capture_recording.wait(timeout=3)
-            except:
-                # Force kill if stuck
-                try:
-                    self.capture_recording.kill()
-                except:
-                    pass
+            recording = self.capture_recording
             self.capture_recording = None
 
             # Reset button color
-            self.set_button_color(self.capture_button, self.colors["capture"])
+            self._apply_state(self.capture_button, "capture")
 
             # Process in background
             self.processing_count += 1
@@ -616,97 +1254,215 @@ class TranscriptButtons(Gtk.Window):
             self.capture_button = None
             self.capture_use_claude = False
 
-            thread = threading.Thread(
-                target=self.process_capture_thread,
-                args=(screenshot_path, audio_path, use_claude)
-            )
-            thread.daemon = True
-            thread.start()
+            # Start processing once arecord has exited and finalized the WAV,
+            # from a GLib child watch instead of blocking the UI in wait()
+            watch = {
+                "recording": recording,
+                "args": (screenshot_path, audio_path, use_claude),
+            }
+            watch["kill_timer"] = GLib.timeout_add(3000, self.kill_stuck_recording, watch)
+            GLib.child_watch_add(GLib.PRIORITY_DEFAULT, recording.pid,
+                                 self.on_capture_recording_exit, watch)
+            try:
+                recording.send_signal(signal.SIGINT)
+            except:
+                pass
+
+    def kill_stuck_recording(self, watch):
+        """Force kill arecord if it is still running after SIGINT"""
+        watch["kill_timer"] = None
+        try:
+            watch["recording"].kill()
+        except:
+            pass
+        return False
+
+    def on_capture_recording_exit(self, pid, status, watch):
+        """arecord has exited - hand the capture off to a job thread"""
+        if watch["kill_timer"] is not None:
+            GLib.source_remove(watch["kill_timer"])
+        self.submit_job(self.process_capture_thread, *watch["args"])
+
+    def _suspend_llama(self, vram_needed=0, exclude=()):
+        """SIGSTOP running llama-server processes (except exclude) and return their pids
+
+        If vram_needed is set, wait until that much VRAM is free: polled via
+        NVML for up to 500 ms, or a fixed 500 ms without it.
+        """
+        pids = []
+        for attempt in range(2):
+            stale = False
+            found, pgid = self._get_llama_pids(max_age=0 if attempt else 5.0)
+            if pgid is not None and not pids and not any(pid in exclude for pid in found):
+                # All servers in one llama-led group: a single killpg covers them
+                try:
+                    os.killpg(pgid, signal.SIGSTOP)
+                    pids = list(found)
+                    break
+                except ProcessLookupError:
+                    continue  # Group is gone - rescan
+            for pid in found:
+                if pid in exclude or pid in pids:
+                    continue
+                try:
+                    os.kill(pid, signal.SIGSTOP)
+                    pids.append(pid)
+                except ProcessLookupError:
+                    stale = True
+                except:
+                    pass
+            if not stale:
+                break  # Otherwise rescan once - a server may have been restarted
+
+        if pids and vram_needed:
+            if self._gpu is None:
+                time.sleep(0.5)  # Let VRAM free up
+            else:
+                for _ in range(50):
+                    try:
+                        if pynvml.nvmlDeviceGetMemoryInfo(self._gpu).free >= vram_needed:
+                            break
+                    except pynvml.NVMLError:
+                        break
+                    time.sleep(0.01)
+        return pids
+
+    def _get_llama_pids(self, max_age=5.0):
+        """(llama-server pids, their shared pgid or None), rescanning /proc only if
+        the cached set is older than max_age"""
+        scanned_at, pids, pgid = self._llama_pids_cache
+        if time.monotonic() - scanned_at >= max_age:
+            pids = _find_pids("llama-server")
+            pgid = _shared_group(pids)
+            self._llama_pids_cache = (time.monotonic(), pids, pgid)
+        return pids, pgid
+
+    def _resume_llama(self, pids):
+        """SIGCONT processes stopped by _suspend_llama"""
+        _, cached, pgid = self._llama_pids_cache
+        if pids and pgid is not None and sorted(pids) == sorted(cached):
+            try:
+                os.killpg(pgid, signal.SIGCONT)
+                return
+            except ProcessLookupError:
+                pass
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGCONT)
+            except:
+                pass
+
+    def _ensure_vl_server(self):
+        """Start the VL server on first use and keep it running; True once healthy"""
+        if self.vl_process and self.vl_process.poll() is None:
+            return True
+
+        # Cold start: kill other LLM servers and wait for them to release VRAM
+        _wait_dead(_pkill("llama-server"), 2000)
+        self._llama_pids_cache = (0.0, [], None)
+
+        # Start VL server with mmproj for vision support
+        self.log(f"[*] Starting VL server with mmproj...")
+        if VL_SOCKET:
+            _remove(VL_SOCKET)  # Stale socket from a killed server
+            listen = ["--host", VL_SOCKET]
+        else:
+            listen = ["--port", str(VL_PORT)]
+        self.vl_process = _Spawned(
+            ["llama-server", "-m", VL_MODEL, "--mmproj", MMPROJ, "-ngl", "99", "-c", "4096"] + listen
+        )
+
+        if _wait_healthy(self.vl_conn, 120, self.vl_process):
+            return True
+
+        self.log("[! VL server failed to start")
+        self.vl_process.terminate()
+        self.vl_process = None
+        return False
+
+    def _stop_idle_vl(self):
+        """Main loop timer: unload the VL server once no capture used it for VL_IDLE_SECS"""
+        if not self._vl_lock.acquire(blocking=False):
+            return False  # A capture is using it; that capture arms a new timer
+        try:
+            if (self.vl_process and self.vl_process.poll() is None
+                    and time.monotonic() - self._vl_used_at >= VL_IDLE_SECS):
+                self.log("[*] VL server idle - unloading it to free VRAM")
+                self.vl_conn.close()
+                self.vl_process.terminate()
+                GLib.child_watch_add(GLib.PRIORITY_DEFAULT, self.vl_process.pid, lambda *args: None)
+                self.vl_process = None
+        finally:
+            self._vl_lock.release()
+        return False  # One-shot; every capture arms its own
+
+    def _vl_post(self, path, make_body, length):
+        """POST JSON to the VL server over the kept-alive connection, return the response
+
+        make_body() must return a fresh iterable of exactly length bytes, so
+        a request that hit a connection the server already closed can be
+        resent once. The returned response has status 200 and an unread body.
+        """
+        headers = {"Content-Type": "application/json", "Content-Length": str(length)}
+        for attempt in range(2):
+            try:
+                self.vl_conn.request("POST", path, body=make_body(), headers=headers)
+                response = self.vl_conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.vl_conn.close()
+                if attempt:
+                    raise
+            except:
+                self.vl_conn.close()  # Don't reuse a connection in an unknown state
+                raise
+        if response.status != 200:
+            response.read()
+            raise RuntimeError(f"HTTP {response.status} {response.reason}")
+        return response
 
     def process_capture_thread(self, screenshot_path, audio_path, use_claude=False):
         """Transcribe audio, analyze with VL model or Claude, execute response"""
-        import base64
-        import json
-        import urllib.request
-        import time
-
         self.log(f"[capture] process_capture_thread started: screenshot={screenshot_path}, audio={audio_path}, claude={use_claude}")
 
         llama_pids = []
+        converted_path = None
         try:
             # Check audio file
-            audio_size = os.path.getsize(audio_path) if os.path.exists(audio_path) else 0
+            try:
+                audio_size = os.path.getsize(audio_path)
+            except OSError:
+                audio_size = 0
             self.log(f"[capture] Audio file size: {audio_size} bytes")
 
             # Suspend llama-server to free VRAM for whisper
             self.log(f"[capture] Suspending llama-server...")
-            result = subprocess.run(["pgrep", "-f", "llama-server"], capture_output=True, text=True)
-            if result.returncode == 0:
-                llama_pids = [int(pid) for pid in result.stdout.strip().split('\n') if pid]
-                for pid in llama_pids:
-                    try:
-                        os.kill(pid, signal.SIGSTOP)
-                    except:
-                        pass
-                time.sleep(0.5)  # Give GPU time to release
-
-            # Transcribe audio
-            self.log(f"[capture] Converting audio...")
-            converted_path = audio_path.replace(".wav", "_16k.wav")
-            subprocess.run(
-                ["ffmpeg", "-y", "-i", audio_path, "-ar", "16000", "-ac", "1", converted_path],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                stdin=subprocess.DEVNULL,
-                start_new_session=True
-            )
+            llama_pids = self._suspend_llama(WHISPER_VRAM_NEEDED)
+
+            # arecord already records 16k mono; only resample if the device refused
+            whisper_input = audio_path
+            if not _is_16k_mono(audio_path):
+                self.log(f"[capture] Converting audio...")
+                converted_path = audio_path.replace(".wav", "_16k.wav")
+                _resample_16k(audio_path, converted_path)
+                whisper_input = converted_path
 
             self.log(f"[capture] Running whisper...")
-            output_base = audio_path.replace(".wav", "")
-            whisper_result = subprocess.run(
-                [WHISPER_CLI, "-m", MODEL, "-f", converted_path,
-                 "-otxt", "-of", output_base,
-                 "-ng",  # Use GPU
-                 "-t", "4"],
-                capture_output=True,
-                text=True,
-                stdin=subprocess.DEVNULL,
-                start_new_session=True
-            )
-            if whisper_result.returncode != 0:
-                self.log(f"[capture] Whisper error: {whisper_result.stderr[:200] if whisper_result.stderr else 'unknown'}")
-
-            transcript_path = output_base + ".txt"
-            transcript = ""
-            if os.path.exists(transcript_path):
-                with open(transcript_path, "r") as f:
-                    transcript = f.read().strip()
-                os.unlink(transcript_path)
+            transcript = self._transcribe(whisper_input)
             self.log(f"[capture] Transcript: '{transcript[:50]}...' " if len(transcript) > 50 else f"[capture] Transcript: '{transcript}'")
 
             # Resume llama-server after whisper
-            for pid in llama_pids:
-                try:
-                    os.kill(pid, signal.SIGCONT)
-                except:
-                    pass
-
-            # Cleanup audio files
-            for p in [audio_path, converted_path]:
-                if os.path.exists(p):
-                    os.unlink(p)
+            self._resume_llama(llama_pids)
 
             if not transcript:
                 self.log("[capture] No transcript - aborting")
-                if os.path.exists(screenshot_path):
-                    os.unlink(screenshot_path)
-                return
+                return  # Screenshot is removed in finally
 
             # ========== CLAUDE MODE ==========
             if use_claude:
                 self.log(f"[* Claude capture mode - sending image + transcript to Claude")
                 # Use claude CLI with image file - Claude can read images via Read tool
-                # Format: "Read this image file: /path/to/image.png and then: <user instruction>"
+                # Format: "Read this image file: /path/to/image.jpg and then: <user instruction>"
                 prompt = f"First, read and analyze this image file: {screenshot_path}\n\nThen respond to this instruction: {transcript}"
 
                 try:
@@ -724,100 +1480,44 @@ class TranscriptButtons(Gtk.Window):
                     self.log("[! Claude capture request timed out")
                 except Exception as e:
                     self.log(f"[! Claude capture failed: {e}")
-                finally:
-                    # Clean up screenshot after Claude processes it
-                    if os.path.exists(screenshot_path):
-                        os.unlink(screenshot_path)
-                return
+                return  # Screenshot is removed in finally
 
             # ========== LOCAL VL MODEL MODE ==========
-            # Kill any existing LLM servers to free VRAM
-            subprocess.run(["pkill", "-f", "llama-server"], stderr=subprocess.DEVNULL)
-            time.sleep(2)
-
-            # Start VL server with mmproj for vision support
-            VL_PORT = 9091
-            VL_MODEL = os.path.expanduser("~/workspace/models/Qwen3-VL-8B-Instruct-Q8_0.gguf")
-            MMPROJ = os.path.expanduser("~/workspace/models/mmproj-Qwen3VL-8B-Instruct-F16.gguf")
-
-            self.log(f"[*] Starting VL server with mmproj...")
-            vl_process = subprocess.Popen(
-                ["llama-server", "-m", VL_MODEL, "--mmproj", MMPROJ, "-ngl", "99", "-c", "4096", "--port", str(VL_PORT)],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                stdin=subprocess.DEVNULL,
-                start_new_session=True
-            )
-
-            server_ready = False
-            for _ in range(120):
+            # Base64 length is known up front, so send a plain Content-Length body
+            body_length = len(_VL_HEAD) + (os.path.getsize(screenshot_path) + 2) // 3 * 4 + len(_VL_TAIL)
+
+            def request_body():
+                yield _VL_HEAD
+                # Encode straight from the page cache: slices of an mmap are
+                # memoryviews, so no per-chunk read() copy is made
+                with open(screenshot_path, "rb") as f:
+                    if os.fstat(f.fileno()).st_size:
+                        with mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ) as mm:
+                            view = memoryview(mm)
+                            try:
+                                for offset in range(0, len(view), VL_B64_CHUNK):
+                                    yield base64.b64encode(view[offset:offset + VL_B64_CHUNK])
+                            finally:
+                                view.release()
+                yield _VL_TAIL
+
+            with self._vl_lock:
+                if not self._ensure_vl_server():
+                    return
+
+                # Pause other LLM servers while the VL model works, not the VL server itself
+                other_pids = self._suspend_llama(exclude=(self.vl_process.pid,))
                 try:
-                    urllib.request.urlopen(f"http://localhost:{VL_PORT}/health", timeout=2)
-                    server_ready = True
-                    break
-                except:
-                    time.sleep(1)
-
-            if not server_ready:
-                self.log("[! VL server failed to start")
-                vl_process.terminate()
-                return
-
-            # Analyze with vision model using OpenAI-compatible API
-            with open(screenshot_path, "rb") as f:
-                image_data = base64.b64encode(f.read()).decode("utf-8")
-
-            prompt = """Describe what you see in this image in detail.
-If it's code/terminal: describe the language, visible code, errors, file paths.
-If it's a UI: describe the elements, text, and layout.
-If it's something else: describe what you actually see.
-Be accurate - only describe what is truly visible."""
-
-            # Use OpenAI-compatible chat completions API with base64 data URL
-            request_data = {
-                "model": "gpt-4-vision-preview",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{image_data}"
-                                }
-                            },
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ],
-                "max_tokens": 1024,
-                "temperature": 0.3
-            }
-
-            req = urllib.request.Request(
-                f"http://localhost:{VL_PORT}/v1/chat/completions",
-                data=json.dumps(request_data).encode("utf-8"),
-                headers={"Content-Type": "application/json"}
-            )
-
-            try:
-                self.log("[*] Waiting for VL response...")
-                with urllib.request.urlopen(req, timeout=180) as response:
-                    result = json.loads(response.read().decode("utf-8"))
-                    # OpenAI chat completions format
-                    vl_response = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-            except Exception as e:
-                self.log(f"[!] VL request failed: {e}")
-                vl_process.terminate()
-                return
-
-            # Shut down VL server
-            vl_process.terminate()
-            vl_process.wait()
-            time.sleep(1)
+                    self.log("[*] Waiting for VL response...")
+                    response = self._vl_post("/v1/chat/completions", request_body, body_length)
+                    vl_response = _completion_content(response)
+                except Exception as e:
+                    self.log(f"[!] VL request failed: {e}")
+                    return
+                finally:
+                    self._resume_llama(other_pids)
+                    self._vl_used_at = time.monotonic()
+                    GLib.timeout_add(VL_IDLE_SECS * 1000, self._stop_idle_vl)
 
             # Log the VL model output so user can see it
             vl_description = vl_response.strip()
@@ -832,21 +1532,17 @@ Be accurate - only describe what is truly visible."""
             # Format: [SCREENSHOT] description + user's command
             content = f"[SCREENSHOT CONTEXT]\n{vl_description}\n[END SCREENSHOT]\n\nUser request: {transcript}"
 
-            filepath = os.path.join(TRANSCRIPT_DIR, "main.txt")
-            with open(filepath, "w") as f:
-                f.write(content)
+            if not self.send_to_listener(content):
+                filepath = os.path.join(TRANSCRIPT_DIR, "main.txt")
+                with open(filepath, "w") as f:
+                    f.write(content)
 
             self.log("[*] Sent to coding agent")
 
         finally:
             # Make sure llama-server is resumed
-            for pid in llama_pids:
-                try:
-                    os.kill(pid, signal.SIGCONT)
-                except:
-                    pass
-            if os.path.exists(screenshot_path):
-                os.unlink(screenshot_path)
+            self._resume_llama(llama_pids)
+            _remove(screenshot_path, audio_path, converted_path)
             GLib.idle_add(self.on_capture_done)
 
     def on_capture_done(self):
@@ -860,14 +1556,11 @@ Be accurate - only describe what is truly visible."""
         self.current_file = os.path.join(TRANSCRIPT_DIR, filename)
         self.temp_wav = f"/tmp/recording_{name}_{os.getpid()}.wav"
 
-        self.set_button_color(button, self.colors["recording"])
+        self._apply_state(button, f"{name}_recording")
 
-        self.recording_process = subprocess.Popen(
-            ["arecord", "-D", AUDIO_DEVICE, "-f", "cd", self.temp_wav],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            stdin=subprocess.DEVNULL,
-            start_new_session=True
+        self.recording_process = _Spawned(
+            ["arecord", "-D", AUDIO_DEVICE, "-f", "S16_LE", "-r", "16000", "-c", "1",
+             self.temp_wav]
         )
 
     def stop_recording(self):
@@ -890,8 +1583,8 @@ Be accurate - only describe what is truly visible."""
             use_claude = self.use_claude  # Capture claude mode state
 
             # Reset button color immediately
-            btn, filename, color = self.buttons[current_name]
-            self.set_button_color(btn, color)
+            btn, filename = self.buttons[current_name]
+            self._apply_state(btn, current_name)
 
             # Reset state so new recording can start
             self.current_button = None
@@ -899,82 +1592,98 @@ Be accurate - only describe what is truly visible."""
             self.current_file = None
             self.temp_wav = None
 
-            # Start transcription in background thread
+            # Start transcription on a job thread
             self.processing_count += 1
             GLib.idle_add(self.update_status)
 
-            thread = threading.Thread(
-                target=self.transcribe_thread,
-                args=(temp_wav, current_file, use_claude)
-            )
-            thread.daemon = True
-            thread.start()
+            self.submit_job(self.transcribe_thread, temp_wav, current_file, use_claude)
+
+    def _transcribe(self, wav_path):
+        """Transcribe a 16 kHz mono WAV, via whisper-server if running, else whisper-cli"""
+        if self.whisper_server and self.whisper_server.poll() is None:
+            try:
+                return self._transcribe_server(wav_path)
+            except (OSError, http.client.HTTPException, ValueError, KeyError) as e:
+                self.log(f"[!] whisper-server failed ({e}), falling back to whisper-cli")
+
+        output_base = os.path.splitext(wav_path)[0]
+        result = subprocess.run(
+            [WHISPER_CLI, "-m", MODEL, "-f", wav_path,
+             "-otxt", "-of", output_base,
+             "-ng",
+             "-t", "4",  # 4 threads for CPU fallback parts
+            ],
+            capture_output=True,
+            text=True,
+            stdin=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        if result.returncode != 0:
+            self.log(f"[!] Whisper error: {result.stderr[:200] if result.stderr else 'unknown'}")
+
+        transcript_path = output_base + ".txt"
+        try:
+            with open(transcript_path, "r") as f:
+                transcript = f.read().strip()
+        except FileNotFoundError:
+            return ""
+        _remove(transcript_path)
+        return transcript
+
+    def _transcribe_server(self, wav_path):
+        """POST a WAV to whisper-server's /inference endpoint and return the text"""
+        boundary = os.urandom(16).hex()
+        with open(wav_path, "rb") as f:
+            audio = f.read()
+        body = b"".join([
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="audio.wav"\r\n'
+            f'Content-Type: audio/wav\r\n\r\n'.encode(),
+            audio,
+            f'\r\n--{boundary}\r\nContent-Disposition: form-data; name="response_format"\r\n\r\n'
+            f'json\r\n--{boundary}--\r\n'.encode(),
+        ])
+
+        conn = http.client.HTTPConnection("localhost", WHISPER_PORT, timeout=120)
+        try:
+            conn.request("POST", "/inference", body=body,
+                         headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+            response = conn.getresponse()
+            if response.status != 200:
+                raise ValueError(f"HTTP {response.status} {response.reason}")
+            return json.loads(response.read())["text"].strip()
+        finally:
+            conn.close()
 
     def transcribe_thread(self, temp_wav, output_file, use_claude=False):
         llama_pids = []
+        converted_wav = None
         try:
             if not os.path.exists(temp_wav):
                 return
 
             # Suspend llama-server to free VRAM for whisper GPU
-            result = subprocess.run(["pgrep", "-f", "llama-server"], capture_output=True, text=True)
-            if result.returncode == 0:
-                llama_pids = [int(p) for p in result.stdout.strip().split('\n') if p]
-                for pid in llama_pids:
-                    try:
-                        os.kill(pid, signal.SIGSTOP)
-                    except:
-                        pass
-                import time
-                time.sleep(0.5)  # Let VRAM free up
-
-            # Convert to 16kHz mono
-            converted_wav = temp_wav.replace(".wav", "_16k.wav")
-            subprocess.run(
-                ["ffmpeg", "-y", "-i", temp_wav, "-ar", "16000", "-ac", "1", converted_wav],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                stdin=subprocess.DEVNULL,
-                start_new_session=True
-            )
-
-            # Run whisper with GPU acceleration
-            output_base = output_file.replace(".txt", "")
-            subprocess.run(
-                [WHISPER_CLI, "-m", MODEL, "-f", converted_wav,
-                 "-otxt", "-of", output_base,
-                 "-ng",  # Use GPU
-                 "-t", "4",  # 4 threads for CPU fallback parts
-                ],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                stdin=subprocess.DEVNULL,
-                start_new_session=True
-            )
-
-            # Prepend metadata to transcript
-            if os.path.exists(output_file):
-                with open(output_file, 'r') as f:
-                    transcript = f.read()
+            llama_pids = self._suspend_llama(WHISPER_VRAM_NEEDED)
+
+            # arecord already records 16k mono; only resample if the device refused
+            whisper_input = temp_wav
+            if not _is_16k_mono(temp_wav):
+                converted_wav = temp_wav.replace(".wav", "_16k.wav")
+                _resample_16k(temp_wav, converted_wav)
+                whisper_input = converted_wav
+
+            # Write the transcript with its metadata prefix in one go
+            transcript = self._transcribe(whisper_input)
+            if transcript:
+                prefix = ""
+                if use_claude:
+                    prefix += "[CLAUDE] "
                 with open(output_file, 'w') as f:
-                    prefix = ""
-                    if use_claude:
-                        prefix += "[CLAUDE] "
                     f.write(f"{prefix}{transcript}")
 
-            # Cleanup
-            if os.path.exists(temp_wav):
-                os.remove(temp_wav)
-            if os.path.exists(converted_wav):
-                os.remove(converted_wav)
-
         finally:
-            # Resume llama-server
-            for pid in llama_pids:
-                try:
-                    os.kill(pid, signal.SIGCONT)
-                except:
-                    pass
+            # Resume llama-server and clean up the recording
+            self._resume_llama(llama_pids)
+            _remove(temp_wav, converted_wav)
             GLib.idle_add(self.on_transcribe_done)
 
     def on_transcribe_done(self):
@@ -10,40 +10,115 @@ import time
 import subprocess
 import threading
 import json
+import hashlib
+import mmap
 import signal
 import fcntl
 import re
+import select
+import selectors
+import socket
+import http.client
+import struct
+import ctypes
+import uuid
+import itertools
+import collections
+import functools
+import concurrent.futures
 from pathlib import Path
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ============== SINGLE INSTANCE LOCK ==============
 LOCK_FILE = "/tmp/transcript-listener.lock"
 
 def acquire_lock():
-    """Ensure only one instance runs at a time"""
+    """Ensure only one instance runs at a time; returns the lock fd"""
+    # No O_TRUNC: the running instance's PID is only replaced once the lock is ours
+    lock_fd = os.open(LOCK_FILE, os.O_WRONLY | os.O_CREAT | os.O_CLOEXEC, 0o644)
     try:
-        lock_fd = open(LOCK_FILE, 'w')
         fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
-        lock_fd.write(str(os.getpid()))
-        lock_fd.flush()
-        return lock_fd
-    except IOError:
+    except OSError:
+        os.close(lock_fd)
         print("[!] Another instance is already running. Exiting.")
         sys.exit(1)
+    os.ftruncate(lock_fd, 0)
+    os.write(lock_fd, str(os.getpid()).encode())
+    return lock_fd
 
 TRANSCRIPT_DIR = "/root/transcripts"
 AGENT_OS_DIR = "/root/workspace/agent-os"
 LOG_DIR = "/root/agent-logs"
-MAIN_LOG = f"{LOG_DIR}/main-history.json"
-CODING_LOG = f"{LOG_DIR}/coding-history.json"
+MAIN_LOG = f"{LOG_DIR}/main-history.jsonl"
+CODING_LOG = f"{LOG_DIR}/coding-history.jsonl"
 MAX_LOG_ENTRIES = 50  # Keep last N entries for context
 
 # LLM server configs
 TEXT_MODEL = os.path.expanduser("~/workspace/models/DeepSeek-Coder-V2-Lite-Instruct-Q5_K_M.gguf")
 VL_MODEL = os.path.expanduser("~/workspace/models/Qwen3-VL-8B-Instruct-Q8_0.gguf")  # Vision model
 TEXT_PORT = 9090
+LLM_START_TIMEOUT = 120  # Seconds for llama-server to listen and load its model
+LLM_POLL_MAX = 2.0  # Backoff cap (seconds) while waiting on it
+HEALTH_TTL = 30  # Seconds a passed health check is trusted without probing again
 VL_PORT = 9091
 
+# transcript-buttons passes the read end of a pipe for typed messages here;
+# each line is handled as if it had been written to main.txt
+SEND_FD_ENV = "AGENT_OS_SEND_FD"
+
+# Agent sync protocol: a line starting with AGENT_MARKER is echoed back by the
+# agent once everything sent before it has been handled, so replies end on an
+# exact marker instead of waiting for output to go quiet
+AGENT_MARKER = "\x1e"
+AGENT_MARKER_BYTES = AGENT_MARKER.encode()
+AGENT_READY = AGENT_MARKER_BYTES + b"\n"  # Bare marker line: banner end of an agent that echoes markers
+AGENT_MARKER_RE = re.compile(rb"\x1e[0-9a-f]*\n")
+AGENT_READ_SIZE = 65536
+AGENT_ECHO_FLUSH = 0.1  # Console echo of agent output is flushed at most this often
+AGENT_PIPE_SIZE = 1 << 20  # Default pipe-max-size; the kernel default is 64 KiB
+F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
+AGENT_REPLY_TIMEOUT = 300  # Upper bound for one agent turn
+AGENT_START_TIMEOUT = 10
+AGENT_QUIET_SECS = 3  # Fallback for agents that never echo markers: reply ends after this much silence
+
+# inotify (via libc - no extra dependency); only completed writes and renames
+# into TRANSCRIPT_DIR are watched, not every access
+_libc = ctypes.CDLL(None, use_errno=True)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = os.O_NONBLOCK
+INOTIFY_EVENT = struct.Struct("iIII")  # struct inotify_event: wd, mask, cookie, len (+ name)
+
+# [PROJECT: /path] tag injected ahead of messages
+_PROJECT_RE = re.compile(r'\[PROJECT:\s*([^\]]+)\]\s*')
+
+# Whole-message commands (lowercased)
+AGENT_CLEAR_COMMANDS = frozenset(['forget', 'reset', 'clear', 'forget context', 'clear context',
+                                  'reset context', 'forget everything'])
+AGENT_CLEAR_PREFIXES = ("reset ", "clear ", "forget ")
+CLAUDE_RESET_COMMANDS = frozenset(["reset", "reset context", "clear context", "clear", "forget"])
+CLAUDE_COMPACT_COMMANDS = frozenset(["compact", "compact context", "summarize context", "compress"])
+
+# Claude Code conversation context, appended per exchange; prompts only use the
+# last MAX_CONTEXT_CHARS and the file is rewritten once it reaches twice that
+CLAUDE_CONTEXT_FILE = f"{LOG_DIR}/claude_context.log"
+MAX_CONTEXT_CHARS = 8000  # Keep context manageable
+CLAUDE_STDIN_THRESHOLD = 4096  # Longer prompts go to claude on stdin, not argv
+
+# Project file enumeration (analyse mode)
+PROJECT_EXTENSIONS = frozenset((".py", ".ts", ".tsx", ".js", ".jsx", ".sol", ".go", ".rs", ".cpp", ".c", ".h", ".java", ".md", ".json", ".yaml", ".yml", ".toml"))
+PROJECT_EXCLUDE_DIRS = frozenset(["node_modules", ".git", "artifacts", "dist", "build", "__pycache__", ".next", "venv", "env"])
+ANALYSE_MAX_FILES = 50
+ANALYSE_MAX_BYTES = 15000  # UTF-8 bytes of code dump sent to Claude
+ANALYSIS_FILE = "PROJECT_ANALYSIS.md"  # Written into the target; not fed back into the next analysis
+
 # File to agent mapping (ordered: main -> coding -> capture)
 # Now using unified agent for both main and coding - routes to same binary
 FILE_AGENTS = [
@@ -62,49 +137,134 @@ FILE_AGENTS = [
         "handler": None,  # Uses VL model, handled specially
     }),
 ]
+FILE_CONFIG = dict(FILE_AGENTS)
+
+# Transcripts bigger than this are hashed through mmap instead of being read
+# (capture payloads); only changed content is then copied out and decoded
+MMAP_THRESHOLD = 16384
+
+# Rewrites of the same file within this window are coalesced into one dispatch
+DEBOUNCE_SECS = 0.1
+WHITESPACE = b" \t\n\r\x0b\x0c"
+
+# Action logs are JSON Lines: one entry appended per line, rewritten down to
+# MAX_LOG_ENTRIES once the file holds twice that.
+# Parsed logs: log_path -> (stat key, entries deque, line count). The agent deletes
+# the log files on "clear", so entries are only reused while the file on disk
+# is unchanged.
+_LOG_CACHE = {}
+
+def _log_stat_key(log_path):
+    st = os.stat(log_path)
+    return (st.st_mtime_ns, st.st_size)
+
+def _dump_entry(entry):
+    """One log line (bytes, newline-terminated)"""
+    if orjson:
+        return orjson.dumps(entry) + b"\n"
+    return json.dumps(entry, separators=(',', ':'), ensure_ascii=False).encode('utf-8') + b"\n"
 
 def load_log(log_path):
-    """Load action log from file"""
-    if os.path.exists(log_path):
-        try:
-            with open(log_path, 'r') as f:
-                return json.load(f)
-        except:
-            pass
-    return []
+    """Load action log from file (cached until the file changes)"""
+    try:
+        stat_key = _log_stat_key(log_path)
+    except OSError:
+        _LOG_CACHE.pop(log_path, None)
+        return ()
+
+    cached = _LOG_CACHE.get(log_path)
+    if cached and cached[0] == stat_key:
+        return cached[1]
+
+    entries = collections.deque(maxlen=MAX_LOG_ENTRIES)  # Older lines fall off while parsing
+    lines = 0
+    try:
+        with open(log_path, 'rb') as f:
+            for line in f:
+                lines += 1
+                try:
+                    entries.append(orjson.loads(line) if orjson else json.loads(line))
+                except ValueError:
+                    pass  # Torn or corrupt line
+    except OSError:
+        pass
+    _LOG_CACHE[log_path] = (stat_key, entries, lines)
+    return entries
 
 def save_log(log_path, entries):
-    """Save action log to file"""
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-    entries = entries[-MAX_LOG_ENTRIES:]
-    with open(log_path, 'w') as f:
-        json.dump(entries, f, indent=2)
+    """Rewrite the action log with the most recent entries"""
+    entries = collections.deque(entries, maxlen=MAX_LOG_ENTRIES)
+    tmp_path = log_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(b"".join(_dump_entry(entry) for entry in entries))
+    os.replace(tmp_path, log_path)
+    _LOG_CACHE[log_path] = (_log_stat_key(log_path), entries, len(entries))
+
+def append_log(log_path, entry):
+    """Append one entry to the action log, compacting it when it gets long"""
+    entries = load_log(log_path)
+    lines = _LOG_CACHE[log_path][2] if log_path in _LOG_CACHE else 0
+    if lines + 1 > 2 * MAX_LOG_ENTRIES:
+        save_log(log_path, itertools.chain(entries, (entry,)))
+        return
+
+    with open(log_path, 'ab') as f:
+        f.write(_dump_entry(entry))
+    if not entries:
+        entries = collections.deque(maxlen=MAX_LOG_ENTRIES)
+    entries.append(entry)  # Cached deque updated in place, oldest entry drops off
+    _LOG_CACHE[log_path] = (_log_stat_key(log_path), entries, lines + 1)
+
+def migrate_log(log_path):
+    """Convert a pre-JSONL log (foo.json, one JSON array) to foo.jsonl"""
+    old_path = log_path[:-1]  # .jsonl -> .json
+    if os.path.exists(log_path) or not os.path.exists(old_path):
+        return
+    try:
+        with open(old_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        save_log(log_path, entries)
+        os.remove(old_path)
+        print(f"[*] Migrated {old_path} -> {log_path}")
+    except Exception as e:
+        print(f"[!] Could not migrate {old_path}: {e}")
+
+# CSI escape sequences (colors, cursor movement); \033 is the same byte as \x1b
+ANSI_RE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+ANSI_CACHE_MAX_LEN = 4096  # Only short texts are memoized, to bound cache memory
+
+@functools.lru_cache(maxsize=256)
+def _strip_ansi_cached(text):
+    return ANSI_RE.sub('', text)
 
 def strip_ansi_codes(text):
     """Remove ANSI escape codes from text"""
-    import re
-    ansi_pattern = re.compile(r'\x1b\[[0-9;]*m|\x1b\[[0-9;]*[A-Za-z]|\033\[[0-9;]*m')
-    return ansi_pattern.sub('', text)
+    if '\x1b' not in text:
+        return text
+    if len(text) <= ANSI_CACHE_MAX_LEN:
+        return _strip_ansi_cached(text)
+    return ANSI_RE.sub('', text)
+
+# Phrases that mark a short response as a bare error (matched lowercased, one regex pass)
+ERROR_PATTERNS = (
+    "unknown command",
+    "error:",
+    "[error",
+    "cannot read",
+    "cannot write",
+    "path outside workspace",
+)
+ERROR_RE = re.compile("|".join(map(re.escape, ERROR_PATTERNS)))
 
 def is_error_only_response(response):
     """Check if response is just an error message with no useful content"""
     if not response:
         return True
     cleaned = strip_ansi_codes(response).strip().lower()
-    error_patterns = [
-        "unknown command",
-        "error:",
-        "[error",
-        "cannot read",
-        "cannot write",
-        "path outside workspace",
-    ]
     # If response is short and mostly just an error, skip it
-    if len(cleaned) < 100:
-        for pattern in error_patterns:
-            if pattern in cleaned and cleaned.count('\n') < 3:
-                return True
-    return False
+    if len(cleaned) >= 100 or cleaned.count('\n') >= 3:
+        return False
+    return ERROR_RE.search(cleaned) is not None
 
 def add_log_entry(log_path, request, response):
     """Add a new entry to the log with deduplication and cleaning"""
@@ -120,7 +280,7 @@ def add_log_entry(log_path, request, response):
     if len(clean_response) > 500:
         clean_response = clean_response[:500] + "..."
 
-    # Load existing entries
+    # Existing entries (cached - no file read unless it changed on disk)
     entries = load_log(log_path)
 
     # Deduplication: check if same request was logged in the last 5 seconds
@@ -144,19 +304,169 @@ def add_log_entry(log_path, request, response):
             except:
                 pass
 
-    entries.append({
+    append_log(log_path, {
         "timestamp": datetime.now().isoformat(),
         "request": request.strip(),
         "response": clean_response
     })
-    save_log(log_path, entries)
+
+def _iter_code_files(root, exts=PROJECT_EXTENSIONS):
+    """Yield source file paths under root lazily, skipping excluded dirs"""
+    for dirpath, dirs, files in os.walk(root, followlinks=False):
+        # Prune excluded directories in place
+        dirs[:] = [d for d in dirs if d not in PROJECT_EXCLUDE_DIRS]
+
+        for f in files:
+            if os.path.splitext(f)[1] in exts:
+                yield os.path.join(dirpath, f)
+
+def _port_open(port):
+    """True if something accepts TCP connections on localhost:port"""
+    with socket.socket() as s:
+        return s.connect_ex(("127.0.0.1", port)) == 0
+
+def _wait_port(port, deadline, process=None):
+    """Wait with exponential backoff (50ms..2s) until port accepts, or monotonic deadline"""
+    delay = 0.05
+    while time.monotonic() < deadline:
+        if _port_open(port):
+            return True
+        if process is not None and process.poll() is not None:
+            return False  # Server exited
+        time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+        delay = min(delay * 1.5, LLM_POLL_MAX)
+    return False
+
+def _find_pids(pattern):
+    """PIDs whose command line contains pattern (like pgrep -f)"""
+    needle = pattern.encode()
+    me = os.getpid()
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit() or int(entry) == me:
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read().replace(b"\0", b" ")
+        except OSError:
+            continue
+        if needle in cmdline:
+            pids.append(int(entry))
+    return pids
+
+def _wait_gone(pattern, timeout=5.0):
+    """Wait with backoff (100ms..1s) until no process matches pattern"""
+    deadline = time.monotonic() + timeout
+    delay = 0.1
+    while _find_pids(pattern) and time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+def _proc_state(pid):
+    """Single-letter state from /proc/<pid>/status, None if it's gone"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("State:"):
+                    return line.split()[1]
+    except OSError:
+        pass
+    return None
+
+def _wait_stopped(pid, stopped=True, timeout=2.0):
+    """Wait until pid has (or no longer has) job-control stopped state T"""
+    deadline = time.monotonic() + timeout
+    delay = 0.005
+    while time.monotonic() < deadline:
+        state = _proc_state(pid)
+        if state is None or (state == "T") == stopped:
+            return
+        time.sleep(delay)
+        delay = min(delay * 2, 0.1)
+
+def _extract_project(text):
+    """Split off [PROJECT: /path] tags: (path or None, stripped text without them)"""
+    match = _PROJECT_RE.search(text)
+    if not match:
+        return None, text.strip()
+    rest = text[:match.start()] + _PROJECT_RE.sub('', text[match.end():])
+    return match.group(1).strip(), rest.strip()
+
+def _trim_context(context):
+    """Most recent MAX_CONTEXT_CHARS of the claude context"""
+    if len(context) > MAX_CONTEXT_CHARS:
+        return "...(earlier context trimmed)...\n\n" + context[-MAX_CONTEXT_CHARS:]
+    return context
+
+def _run_claude_streaming(prompt, cwd=None, timeout=300):
+    """Run claude -p, printing stdout as it arrives; returns (stdout, stderr)"""
+    use_stdin = len(prompt) > CLAUDE_STDIN_THRESHOLD
+    args = ["claude", "-p"] + ([] if use_stdin else [prompt]) + ["--permission-mode", "acceptEdits"]
+    proc = subprocess.Popen(
+        args,
+        stdin=subprocess.PIPE if use_stdin else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        cwd=cwd,
+        start_new_session=True
+    )
+
+    if use_stdin:
+        # Fed from a thread so a full stdin pipe can't stall reading stdout
+        def feed():
+            try:
+                proc.stdin.write(prompt)
+                proc.stdin.close()
+            except OSError:
+                pass
+        threading.Thread(target=feed, daemon=True).start()
+
+    # stderr drained on the side so a chatty CLI can't block stdout
+    err = []
+    err_thread = threading.Thread(target=lambda: err.append(proc.stderr.read()), daemon=True)
+    err_thread.start()
+
+    timed_out = []
+    def kill():
+        # Whole group - tools claude started would otherwise keep stdout open
+        timed_out.append(True)
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+
+    lines = []
+    try:
+        for line in proc.stdout:
+            print(f"[claude] {line}", end="", flush=True)
+            lines.append(line)
+        proc.wait()
+    finally:
+        timer.cancel()
+    err_thread.join()
+
+    if timed_out:
+        raise subprocess.TimeoutExpired(proc.args, timeout)
+    return "".join(lines), "".join(err)
 
 def get_context_from_log(log_path, max_entries=5):
     """Get recent context from log for the agent - single line format"""
+    try:
+        mtime = os.stat(log_path).st_mtime_ns
+    except OSError:
+        return ""
+    return _build_context(log_path, mtime, max_entries)
+
+@functools.lru_cache(maxsize=16)
+def _build_context(log_path, mtime, max_entries):
+    """Context line for one version (mtime) of the log"""
     entries = load_log(log_path)
     if not entries:
         return ""
-    recent = entries[-max_entries:]
+    recent = itertools.islice(entries, max(0, len(entries) - max_entries), None)
     context_parts = []
     for entry in recent:
         req = entry['request'][:80].replace('\n', ' ')
@@ -164,16 +474,84 @@ def get_context_from_log(log_path, max_entries=5):
     return "Previous: " + " | ".join(context_parts)
 
 
+class AgentOutputReader:
+    """Single thread reading the stdout of every persistent agent"""
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        # epoll picks up fds registered from other threads mid-wait, so an idle
+        # reader can block indefinitely; other selectors re-check periodically
+        self.idle_timeout = None if isinstance(self.selector, getattr(selectors, "EpollSelector", ())) else 0.5
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def register(self, agent, proc):
+        """Start delivering proc's output to agent.on_output"""
+        fd = proc.stdout.fileno()
+        try:
+            # fd number reused after an old agent's pipe was closed
+            self.selector.unregister(fd)
+        except (KeyError, ValueError):
+            pass
+        self.selector.register(fd, selectors.EVENT_READ, (agent, proc))
+
+    def _run(self):
+        # Console echo is buffered and flushed on reply end, at most every
+        # AGENT_ECHO_FLUSH while output streams, and when output goes quiet
+        out = sys.stdout.buffer
+        unflushed = False
+        last_flush = time.monotonic()
+        while True:
+            events = self.selector.select(AGENT_ECHO_FLUSH if unflushed else self.idle_timeout)
+            flush = unflushed and not events
+            for key, _ in events:
+                agent, proc = key.data
+                try:
+                    chunk = os.read(key.fd, AGENT_READ_SIZE)
+                except OSError:
+                    chunk = b''
+                if not chunk:
+                    self.selector.unregister(key.fd)
+                    agent.on_exit(proc)
+                    flush = unflushed
+                    continue
+                try:
+                    echo, done = agent.on_output(proc, chunk)
+                except Exception as e:
+                    print(f"[!] {agent.name} output error: {e}")
+                    continue
+                if echo:
+                    out.write(echo)
+                    unflushed = True
+                flush = flush or (unflushed and done)
+
+            now = time.monotonic()
+            if flush or (unflushed and now - last_flush >= AGENT_ECHO_FLUSH):
+                try:
+                    out.flush()
+                except:
+                    pass
+                unflushed = False
+                last_flush = now
+
+
 class PersistentAgent:
     """Keeps an agent process running and accepts multiple inputs"""
-    def __init__(self, name, binary, log_path=None):
+    def __init__(self, name, binary, log_path=None, reader=None):
         self.name = name
         self.binary = binary
         self.log_path = log_path
         self.proc = None
-        self.output_buffer = []
-        self.reader_thread = None
-        self.lock = threading.Lock()
+        # Raw output chunks since the last send. Only the reader thread appends and
+        # a send swaps in a fresh deque, so no lock is needed (deque.append is atomic)
+        self.output_buffer = collections.deque()
+        self.reader = reader  # Shared AgentOutputReader
+        self.prefix = f"[{name}] ".encode()
+        self.partial = b''
+        self.at_line_start = True
+        self.marker = None  # Marker line (bytes) the current send is waiting for
+        self.done_event = threading.Event()
+        self.echoes_markers = False  # Set once the agent has announced or echoed a marker
+        self.last_output = 0.0  # time.monotonic() of the last output chunk
         self.fresh_start = True  # True when agent just started, needs context
         self.binary_mtime = None  # Track binary modification time
 
@@ -200,33 +578,121 @@ class PersistentAgent:
 
         print(f"[*] Starting persistent {self.name}...")
         self.fresh_start = True  # Mark as fresh start, needs context on first message
+        self.echoes_markers = False  # Re-learned per process; the binary may have been swapped
         self.proc = subprocess.Popen(
             [self.binary],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
+            bufsize=AGENT_READ_SIZE,  # Binary; stdout is read raw via os.read anyway
             start_new_session=True
         )
 
-        # Start output reader thread
-        self.reader_thread = threading.Thread(target=self._read_output, daemon=True)
-        self.reader_thread.start()
+        # Bigger pipes so long replies and prompts move in fewer read/write calls
+        for pipe in (self.proc.stdin, self.proc.stdout):
+            try:
+                fcntl.fcntl(pipe.fileno(), F_SETPIPE_SZ, AGENT_PIPE_SIZE)
+            except OSError:
+                pass
 
-        # Wait for startup banner
-        time.sleep(0.5)
+        # Output is read by the shared reader thread
+        self.partial = b''
+        self.at_line_start = True
+        self.output_buffer = collections.deque()
+        self.marker = AGENT_READY
+        self.done_event.clear()
+        self.reader.register(self, self.proc)
+
+        # Wait for the startup banner. A marker-aware agent ends it with a bare
+        # marker line; nothing is written, so an old binary gets no stray input
+        self._wait_done(AGENT_START_TIMEOUT)
         return self.proc.poll() is None
 
-    def _read_output(self):
-        """Continuously read output from agent"""
-        try:
-            for line in self.proc.stdout:
-                with self.lock:
-                    self.output_buffer.append(line)
-                print(f"[{self.name}] {line}", end="")
-        except:
-            pass
+    def on_output(self, proc, chunk):
+        """Handle a chunk of agent stdout; returns console echo bytes and done flag"""
+        if proc is not self.proc:
+            return b'', False  # Late output from a process that was replaced
+        data = self.partial + chunk if self.partial else chunk
+        self.partial = b''
+        self.last_output = time.monotonic()
+
+        # One scan for the marker byte; plain output (the common case) needs nothing more
+        done = False
+        cut = data.rfind(AGENT_MARKER_BYTES)
+        if cut != -1:
+            # Hold back a marker that hasn't been fully read yet
+            if data.find(b'\n', cut) == -1:
+                data, self.partial = data[:cut], data[cut:]
+
+            # Sync marker echoes are never part of the reply
+            if AGENT_MARKER_BYTES in data:
+                # Only the exact marker line counts as an echo - an old binary
+                # can still repeat the marker inside ordinary output
+                done = self.marker is not None and self.marker in data
+                self.echoes_markers = self.echoes_markers or done
+                data = AGENT_MARKER_RE.sub(b'', data)
+
+        if data:
+            self.output_buffer.append(data)
+        if done:
+            self.done_event.set()
+
+        if not data:
+            return b'', done
+
+        # Console echo: raw bytes with a pre-encoded per-line prefix
+        echo = data.replace(b"\n", b"\n" + self.prefix)
+        if self.at_line_start:
+            echo = self.prefix + echo
+        self.at_line_start = data.endswith(b"\n")
+        if self.at_line_start:
+            echo = echo[:-len(self.prefix)]
+        return echo, done
+
+    def on_exit(self, proc):
+        """Agent stdout closed"""
+        if proc is self.proc:
+            # Agent exited - don't leave a send waiting for its marker
+            self.done_event.set()
+
+    def _send_and_wait(self, line, timeout=AGENT_REPLY_TIMEOUT):
+        """Write a line, wait for the agent to finish it"""
+        self.output_buffer = collections.deque()
+        self.done_event.clear()
+
+        # Only a binary that announced marker support gets one after the line;
+        # an old one would take the marker line as a prompt of its own
+        data = (line + "\n").encode()
+        if self.echoes_markers:
+            self.marker = (AGENT_MARKER + uuid.uuid4().hex + "\n").encode()
+            data += self.marker
+        else:
+            self.marker = None
+        self.proc.stdin.write(data)
+        self.proc.stdin.flush()
+        return self._wait_done(timeout)
+
+    def _wait_done(self, timeout):
+        """Wait for the current marker, returns the output collected meanwhile"""
+        # Marker echo ends the wait; an agent binary without marker support
+        # (not rebuilt yet) falls back to output quiescence
+        self.last_output = time.monotonic()
+        deadline = self.last_output + timeout
+        while True:
+            now = time.monotonic()
+            if self.echoes_markers:
+                wait = deadline - now
+            else:
+                wait = min(deadline, self.last_output + AGENT_QUIET_SECS) - now
+            if self.done_event.wait(max(wait, 0)):
+                break
+            now = time.monotonic()
+            if now >= deadline:
+                print(f"[!] {self.name} did not finish within {timeout}s")
+                break
+            if not self.echoes_markers and now - self.last_output >= AGENT_QUIET_SECS:
+                break
+        return b''.join(self.output_buffer).decode('utf-8', 'replace')
 
     def send(self, text):
         """Send input to the running agent"""
@@ -234,10 +700,6 @@ class PersistentAgent:
             if not self.start():
                 return None
 
-        # Clear output buffer
-        with self.lock:
-            self.output_buffer = []
-
         # Check for special commands - extract actual message ignoring PROJECT CONTEXT
         text_lower = text.lower().strip()
 
@@ -252,16 +714,10 @@ class PersistentAgent:
                 user_cmd = user_cmd[bracket_end + 1:].strip()
 
         # "reset", "clear", "forget" commands - send clear to agent
-        clear_commands = ["reset", "clear", "forget", "clear context", "forget context",
-                         "reset context", "forget everything"]
-        if user_cmd in clear_commands or any(user_cmd.startswith(c + " ") for c in ["reset", "clear", "forget"]):
+        if user_cmd in AGENT_CLEAR_COMMANDS or user_cmd.startswith(AGENT_CLEAR_PREFIXES):
             try:
-                self.proc.stdin.write("clear\n")
-                self.proc.stdin.flush()
                 print(f"[*] Sent clear to {self.name}")
-                time.sleep(0.5)
-                with self.lock:
-                    return "".join(self.output_buffer) or "[Context cleared]"
+                return self._send_and_wait("clear", AGENT_START_TIMEOUT) or "[Context cleared]"
             except:
                 pass
             return "[Context cleared]"
@@ -284,34 +740,13 @@ class PersistentAgent:
         try:
             # CRITICAL: Collapse multi-line input to single line
             # The agent reads one line at a time, so newlines would be processed as separate commands
-            text_single_line = text.replace('\n', ' ').replace('\r', ' ')
-            # Remove excessive spaces
-            while '  ' in text_single_line:
-                text_single_line = text_single_line.replace('  ', ' ')
+            # (one pass: splits on any whitespace run, which also drops excessive spaces)
+            text_single_line = " ".join(text.split())
 
-            self.proc.stdin.write(text_single_line + "\n")
-            self.proc.stdin.flush()
             print(f"[>] Sent to {self.name}: {text_single_line[:50]}...")
 
-            # Wait for response (look for completion indicators)
-            # Agent prints output then waits for next input
-            time.sleep(2)  # Initial wait
-
-            # Wait until no new output for 3 seconds (agent is done)
-            last_count = -1
-            stable_count = 0
-            while stable_count < 3:
-                with self.lock:
-                    current_count = len(self.output_buffer)
-                if current_count == last_count:
-                    stable_count += 1
-                else:
-                    stable_count = 0
-                    last_count = current_count
-                time.sleep(1)
-
-            with self.lock:
-                return "".join(self.output_buffer)
+            # Agent prints output, then echoes the marker when it reads the next line
+            return self._send_and_wait(text_single_line)
 
         except BrokenPipeError:
             print(f"[!] {self.name} pipe broken, will restart on next request")
@@ -326,7 +761,7 @@ class PersistentAgent:
         if self.proc and self.proc.poll() is None:
             # Send exit command
             try:
-                self.proc.stdin.write("exit\n")
+                self.proc.stdin.write(b"exit\n")
                 self.proc.stdin.flush()
                 self.proc.wait(timeout=5)
             except:
@@ -342,6 +777,19 @@ class AgentManager:
         self.llm_server = None
         self.llm_suspended = False
         self.persistent_agents = {}  # name -> PersistentAgent
+        self.output_reader = AgentOutputReader()  # One thread for all agent stdouts
+        self.health_conns = {}  # port -> keep-alive HTTPConnection for /health
+        self.health_ok_at = {}  # port -> time.monotonic() of the last passed check
+        self.analysis_dumps = {}  # target -> (file fingerprint, code dump)
+        self.analysis_results = {}  # code dump digest -> Claude's analysis
+
+        # Claude context is read once here, then kept in memory
+        self.claude_context = ""
+        try:
+            with open(CLAUDE_CONTEXT_FILE, "r") as f:
+                self.claude_context = f.read()
+        except OSError:
+            pass
 
         # Create persistent agents
         for filename, config in FILE_AGENTS:
@@ -349,25 +797,54 @@ class AgentManager:
                 self.persistent_agents[config["name"]] = PersistentAgent(
                     config["name"],
                     config["binary"],
-                    config.get("log")  # Pass log path for context on restart
+                    config.get("log"),  # Pass log path for context on restart
+                    self.output_reader
                 )
 
+    def prewarm(self):
+        """Start the LLM server and all persistent agents at the same time"""
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.persistent_agents) or 1) as pool:
+            starts = {pool.submit(agent.start): name for name, agent in self.persistent_agents.items()}
+            self.ensure_llm_server()
+        for future, name in starts.items():
+            if future.exception():
+                print(f"[!] Could not pre-start {name}: {future.exception()}")
+
+    def _health_ok(self, port):
+        """GET /health on localhost:port over a reused keep-alive connection"""
+        conn = self.health_conns.get(port)
+        if conn is None:
+            conn = self.health_conns[port] = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+        try:
+            conn.request("GET", "/health")
+            response = conn.getresponse()
+            response.read()
+            return response.status == 200
+        except (OSError, http.client.HTTPException):
+            conn.close()  # Reconnects on the next request
+            return False
+
     def ensure_llm_server(self, port=TEXT_PORT, model=TEXT_MODEL):
         """Make sure LLM server is running on specified port with specified model"""
-        import urllib.request
+        # Healthy a moment ago: a server we spawned only needs poll(); one we
+        # adopted (e.g. the widget may have killed it) still gets a TCP probe
+        if time.monotonic() - self.health_ok_at.get(port, 0) < HEALTH_TTL:
+            if self.llm_server is not None:
+                if self.llm_server.poll() is None:
+                    return True
+            elif _port_open(port):
+                return True
+            self.health_ok_at.pop(port, None)
 
-        # Check if already running on correct port
-        try:
-            urllib.request.urlopen(f"http://localhost:{port}/health", timeout=2)
+        # Check if already running on correct port (TCP probe first, /health only if listening)
+        if _port_open(port) and self._health_ok(port):
             print(f"[*] LLM server already running on port {port}")
+            self.health_ok_at[port] = time.monotonic()
             return True
-        except:
-            pass
 
         # Kill any existing llama-server to free VRAM
         print("[*] Stopping any existing llama-server...")
-        subprocess.run(["pkill", "-f", "llama-server"], stderr=subprocess.DEVNULL)
-        time.sleep(2)
+        self.shutdown_llm()
 
         print(f"[*] Starting LLM server on port {port}...")
         self.llm_server = subprocess.Popen(
@@ -379,14 +856,18 @@ class AgentManager:
             start_new_session=True
         )
 
-        # Wait for server to start
-        for _ in range(120):
-            try:
-                urllib.request.urlopen(f"http://localhost:{port}/health", timeout=2)
-                print(f"[*] LLM server ready on port {port}")
-                return True
-            except:
-                time.sleep(1)
+        # Wait for server to start: cheap TCP probes until it listens, then
+        # /health until the model has loaded (it answers 503 while loading)
+        deadline = time.monotonic() + LLM_START_TIMEOUT
+        if _wait_port(port, deadline, self.llm_server):
+            delay = 0.05
+            while time.monotonic() < deadline and self.llm_server.poll() is None:
+                if self._health_ok(port):
+                    print(f"[*] LLM server ready on port {port}")
+                    self.health_ok_at[port] = time.monotonic()
+                    return True
+                time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+                delay = min(delay * 1.5, LLM_POLL_MAX)
         print("[!] LLM server failed to start")
         return False
 
@@ -396,7 +877,7 @@ class AgentManager:
             print("[*] Suspending LLM server...")
             os.kill(self.llm_server.pid, signal.SIGSTOP)
             self.llm_suspended = True
-            time.sleep(1)
+            _wait_stopped(self.llm_server.pid)
 
     def resume_llm(self):
         """Resume (SIGCONT) the suspended LLM server"""
@@ -404,7 +885,7 @@ class AgentManager:
             print("[*] Resuming LLM server...")
             os.kill(self.llm_server.pid, signal.SIGCONT)
             self.llm_suspended = False
-            time.sleep(1)
+            _wait_stopped(self.llm_server.pid, stopped=False)
 
     def send_to_agent(self, agent_name, text, log_path=None):
         """Send text to a persistent agent"""
@@ -413,13 +894,13 @@ class AgentManager:
             return
 
         # Clean input - ensure single line
-        text_clean = text.replace('\n', ' ').strip()
+        text_clean = " ".join(text.split())
 
         # Check for context clear commands BEFORE adding project context
         # Extract the actual user message (after [PROJECT:...] tag if present)
-        user_msg = re.sub(r'\[PROJECT:\s*[^\]]+\]\s*', '', text_clean).strip().lower()
-        if user_msg in ['forget', 'reset', 'clear', 'forget context', 'clear context',
-                        'reset context', 'forget everything']:
+        project_path, user_request = _extract_project(text_clean)
+        user_msg = user_request.lower()
+        if user_msg in AGENT_CLEAR_COMMANDS:
             # Send directly without project context injection
             agent = self.persistent_agents.get(agent_name)
             if agent:
@@ -429,16 +910,10 @@ class AgentManager:
 
         # If PROJECT specified, add it as a prefix for the unified agent
         # The agent will use this for coding tasks in that directory
-        if "[PROJECT:" in text_clean:
-            match = re.search(r'\[PROJECT:\s*([^\]]+)\]', text_clean)
-            if match:
-                project_path = match.group(1).strip()
-                # Extract just the user's request (after the [PROJECT:...] tag)
-                user_request = re.sub(r'\[PROJECT:\s*[^\]]+\]\s*', '', text_clean).strip()
-
-                # Simple, clean format - no multi-line blocks, no file injection
-                text_clean = f"[PROJECT: {project_path}] {user_request}"
-                print(f"[*] Project context: {project_path}")
+        if project_path:
+            # Simple, clean format - no multi-line blocks, no file injection
+            text_clean = f"[PROJECT: {project_path}] {user_request}"
+            print(f"[*] Project context: {project_path}")
 
         # Get or create persistent agent
         agent = self.persistent_agents.get(agent_name)
@@ -479,30 +954,66 @@ class AgentManager:
         # Resume text LLM
         self.resume_llm()
 
-    def send_to_claude(self, content, source_file):
-        """Send content to Claude Code CLI with context persistence"""
-        import re
+    def _build_code_dump(self, target, files):
+        """First 100 lines of each file, headed by its path, up to ANALYSE_MAX_BYTES of UTF-8"""
+        buf = bytearray()
+        for filepath in files:
+            rel_path = os.path.relpath(filepath, target)
+            try:
+                with open(filepath, 'rb') as file:
+                    buf += f"\n=== {rel_path} ===\n".encode()
+                    for line in itertools.islice(file, 100):  # First 100 lines, rest never read
+                        if len(buf) >= ANALYSE_MAX_BYTES:
+                            break
+                        buf += line
+            except:
+                pass
+            if len(buf) >= ANALYSE_MAX_BYTES:  # Dump is cut here anyway
+                break
+        if len(buf) > ANALYSE_MAX_BYTES:
+            # Limit total size, cutting before a character the limit would split
+            cut = ANALYSE_MAX_BYTES
+            while cut > 0 and buf[cut] & 0xC0 == 0x80:  # UTF-8 continuation byte
+                cut -= 1
+            del buf[cut:]
+        return buf.decode('utf-8', 'ignore')  # Drops undecodable bytes in the files themselves
+
+    def _run_analysis(self, target, code_dump):
+        """Ask Claude for a project analysis of the code dump, returns its answer"""
+        analysis_prompt = f"""You are analyzing a codebase at '{target}'. Based on the code files below, write a comprehensive project analysis that includes:
 
-        CLAUDE_CONTEXT_FILE = "/root/agent-logs/claude_context.log"
-        MAX_CONTEXT_CHARS = 8000  # Keep context manageable
+1. **Project Overview** - What is this project? What problem does it solve?
+2. **Architecture** - What are the main components (backend, frontend, mobile, blockchain, etc.)?
+3. **Tech Stack** - What languages, frameworks, and tools are used?
+4. **Key Features** - What functionality does this project provide?
+5. **Project Structure** - How is the code organized?
+6. **Entry Points** - Where does the application start? Main files?
+
+Be detailed and specific based on the actual code you see:
 
+{code_dump}"""
+
+        stdout, stderr = _run_claude_streaming(analysis_prompt, cwd=target, timeout=300)
+        return stdout.strip()
+
+    def send_to_claude(self, content, source_file):
+        """Send content to Claude Code CLI with context persistence"""
         # Check for reset command
         content_lower = content.lower().strip()
-        if content_lower in ["reset", "reset context", "clear context", "clear", "forget"]:
+        if content_lower in CLAUDE_RESET_COMMANDS:
             if os.path.exists(CLAUDE_CONTEXT_FILE):
                 os.unlink(CLAUDE_CONTEXT_FILE)
+            self.claude_context = ""
             print("[*] Claude context cleared")
             return
 
         # Check for compact command
-        if content_lower in ["compact", "compact context", "summarize context", "compress"]:
-            if not os.path.exists(CLAUDE_CONTEXT_FILE):
+        if content_lower in CLAUDE_COMPACT_COMMANDS:
+            context = _trim_context(self.claude_context)
+            if not context:
                 print("[*] No context to compact")
                 return
 
-            with open(CLAUDE_CONTEXT_FILE, "r") as f:
-                context = f.read()
-
             if len(context) < 500:
                 print("[*] Context already compact")
                 return
@@ -523,31 +1034,24 @@ Keep it concise but retain enough detail to continue the conversation naturally.
 Provide a compact summary:"""
 
             try:
-                result = subprocess.run(
-                    ["claude", "-p", compact_prompt, "--permission-mode", "acceptEdits"],
-                    capture_output=True,
-                    text=True,
-                    timeout=120
-                )
-                summary = result.stdout.strip()
+                stdout, stderr = _run_claude_streaming(compact_prompt, timeout=120)
+                summary = stdout.strip()
 
                 # Save compacted context
                 compacted = f"=== COMPACTED CONTEXT ===\n{summary}\n=== END COMPACTED ===\n\n"
                 with open(CLAUDE_CONTEXT_FILE, "w") as f:
                     f.write(compacted)
+                self.claude_context = compacted
 
                 print(f"[*] Context compacted: {len(context)} -> {len(compacted)} chars")
-                print(f"[claude] {summary[:200]}...")
             except Exception as e:
                 print(f"[!] Compact failed: {e}")
             return
 
         # Extract project path if present
-        project_dir = "/root/workspace"
-        match = re.search(r'\[PROJECT:\s*([^\]]+)\]', content)
-        if match:
-            project_dir = match.group(1).strip()
-            content = re.sub(r'\[PROJECT:\s*[^\]]+\]\s*', '', content)
+        project_path, content = _extract_project(content)
+        project_dir = project_path or "/root/workspace"
+        content_lower = content.lower()
 
         # Check for analyse/crawl command
         if content_lower.startswith(("analyse", "analyze", "crawl")):
@@ -569,62 +1073,46 @@ Provide a compact summary:"""
 
             # Gather code files
             try:
-                code_content = []
-                extensions = (".py", ".ts", ".tsx", ".js", ".jsx", ".sol", ".go", ".rs", ".cpp", ".c", ".h", ".java", ".md", ".json", ".yaml", ".yml", ".toml")
-                exclude_dirs = ("node_modules", ".git", "artifacts", "dist", "build", "__pycache__", ".next", "venv", "env")
-
-                for root, dirs, files in os.walk(target):
-                    # Skip excluded directories
-                    dirs[:] = [d for d in dirs if d not in exclude_dirs]
-
-                    for f in files:
-                        if f.endswith(extensions):
-                            filepath = os.path.join(root, f)
-                            rel_path = os.path.relpath(filepath, target)
-                            try:
-                                with open(filepath, 'r', errors='ignore') as file:
-                                    content_lines = file.readlines()[:100]  # First 100 lines
-                                    code_content.append(f"\n=== {rel_path} ===\n{''.join(content_lines)}")
-                            except:
-                                pass
-
-                            if len(code_content) > 50:  # Limit files
-                                break
-                    if len(code_content) > 50:
-                        break
-
-                if not code_content:
+                files = list(itertools.islice(
+                    (p for p in _iter_code_files(target) if os.path.basename(p) != ANALYSIS_FILE),
+                    ANALYSE_MAX_FILES))
+
+                # Unchanged tree (same files, mtimes and sizes) reuses the last dump
+                fingerprint = []
+                for filepath in files:
+                    try:
+                        st = os.stat(filepath)
+                        fingerprint.append((filepath, st.st_mtime_ns, st.st_size))
+                    except OSError:
+                        pass
+                fingerprint = tuple(fingerprint)
+                cached = self.analysis_dumps.get(target)
+                if cached and cached[0] == fingerprint:
+                    print("[*] Codebase unchanged since last analysis, reusing file dump")
+                    code_dump = cached[1]
+                else:
+                    code_dump = self._build_code_dump(target, files)
+                    if code_dump:
+                        self.analysis_dumps[target] = (fingerprint, code_dump)
+
+                if not code_dump:
                     print("[!] No code files found")
                     return
 
-                code_dump = ''.join(code_content)[:15000]  # Limit total size
-
-                analysis_prompt = f"""You are analyzing a codebase at '{target}'. Based on the code files below, write a comprehensive project analysis that includes:
-
-1. **Project Overview** - What is this project? What problem does it solve?
-2. **Architecture** - What are the main components (backend, frontend, mobile, blockchain, etc.)?
-3. **Tech Stack** - What languages, frameworks, and tools are used?
-4. **Key Features** - What functionality does this project provide?
-5. **Project Structure** - How is the code organized?
-6. **Entry Points** - Where does the application start? Main files?
-
-Be detailed and specific based on the actual code you see:
-
-{code_dump}"""
-
-                result = subprocess.run(
-                    ["claude", "-p", analysis_prompt, "--permission-mode", "acceptEdits"],
-                    capture_output=True,
-                    text=True,
-                    timeout=300,
-                    cwd=target
-                )
-
-                analysis = result.stdout.strip()
-                print(f"[claude] {analysis}")
+                # Identical dump - Claude's answer from last time still applies
+                dump_digest = hashlib.blake2s(code_dump.encode(), digest_size=16).digest()
+                analysis = self.analysis_results.get(dump_digest)
+                if analysis:
+                    print("[*] Same code as the last analysis, reusing Claude's answer")
+                    print(f"[claude] {analysis}")
+                else:
+                    analysis = self._run_analysis(target, code_dump)
+                    if analysis:
+                        self.analysis_results[dump_digest] = analysis
 
-                # Save analysis to file
-                analysis_file = os.path.join(target, "PROJECT_ANALYSIS.md")
+                # Save analysis to file - on a cache hit too, since the file may have
+                # been edited or deleted (it's left out of the fingerprint)
+                analysis_file = os.path.join(target, ANALYSIS_FILE)
                 with open(analysis_file, "w") as f:
                     f.write(f"# Project Analysis\n\n{analysis}\n")
                 print(f"[*] Analysis saved to: {analysis_file}")
@@ -635,11 +1123,8 @@ Be detailed and specific based on the actual code you see:
 
         print(f"[*] Sending to Claude Code: {content[:50]}...")
 
-        # Load existing context
-        context = ""
-        if os.path.exists(CLAUDE_CONTEXT_FILE):
-            with open(CLAUDE_CONTEXT_FILE, "r") as f:
-                context = f.read()
+        # Existing context (in memory, trimmed to the recent part)
+        context = _trim_context(self.claude_context)
 
         # Build prompt with context
         if context:
@@ -657,31 +1142,23 @@ Respond to the current request, using context from our previous conversation if
 
         # Run claude CLI in print mode
         try:
-            result = subprocess.run(
-                ["claude", "-p", full_prompt, "--permission-mode", "acceptEdits"],
-                capture_output=True,
-                text=True,
-                timeout=300,  # 5 minute timeout
-                cwd=project_dir
-            )
-            response = result.stdout.strip()
-            print(f"[claude] {response}")
-            if result.stderr:
-                print(f"[claude-err] {result.stderr}")
+            stdout, stderr = _run_claude_streaming(full_prompt, cwd=project_dir, timeout=300)  # 5 minute timeout
+            response = stdout.strip()
+            if stderr:
+                print(f"[claude-err] {stderr}")
 
             # Append this exchange to context log
             new_entry = f"USER: {content}\nCLAUDE: {response}\n\n"
-            context += new_entry
-
-            # Trim context if too long (keep most recent)
-            if len(context) > MAX_CONTEXT_CHARS:
-                # Keep the last MAX_CONTEXT_CHARS characters
-                context = "...(earlier context trimmed)...\n\n" + context[-MAX_CONTEXT_CHARS:]
+            self.claude_context += new_entry
 
-            # Save updated context
-            os.makedirs(os.path.dirname(CLAUDE_CONTEXT_FILE), exist_ok=True)
-            with open(CLAUDE_CONTEXT_FILE, "w") as f:
-                f.write(context)
+            if len(self.claude_context) > 2 * MAX_CONTEXT_CHARS:
+                # Too long - rewrite with just the most recent part
+                self.claude_context = _trim_context(self.claude_context)
+                with open(CLAUDE_CONTEXT_FILE, "w") as f:
+                    f.write(self.claude_context)
+            else:
+                with open(CLAUDE_CONTEXT_FILE, "a") as f:
+                    f.write(new_entry)
 
         except subprocess.TimeoutExpired:
             print("[!] Claude request timed out (5 min)")
@@ -689,11 +1166,24 @@ Respond to the current request, using context from our previous conversation if
             print(f"[!] Claude failed: {e}")
 
     def shutdown_llm(self):
-        """Shut down the LLM server"""
-        subprocess.run(["pkill", "-f", "llama-server"], stderr=subprocess.DEVNULL)
+        """Shut down the LLM server (pkill only for one we didn't start)"""
+        self.health_ok_at.clear()
+        if self.llm_server and self.llm_server.poll() is None:
+            if self.llm_suspended:
+                # SIGTERM stays pending while stopped
+                os.kill(self.llm_server.pid, signal.SIGCONT)
+            self.llm_server.terminate()
+            try:
+                self.llm_server.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.llm_server.kill()
+                self.llm_server.wait()
+        elif self.llm_server is None:
+            # Orphan from a previous listener
+            subprocess.run(["pkill", "-f", "llama-server"], stderr=subprocess.DEVNULL)
+            _wait_gone("llama-server")
         self.llm_server = None
         self.llm_suspended = False
-        time.sleep(1)
 
     def shutdown(self):
         """Clean up all agents and LLM"""
@@ -707,45 +1197,194 @@ Respond to the current request, using context from our previous conversation if
 class TranscriptWatcher:
     def __init__(self, agent_manager):
         self.agent_manager = agent_manager
-        self.file_mtimes = {}
-        self.file_contents = {}
-        self.startup_time = time.time()  # Ignore files modified before this
+        # filename -> handler(content), built once; FILE_AGENTS keeps the order
+        self.handlers = {filename: self._make_handler(filename, config)
+                         for filename, config in FILE_AGENTS}
+        self.file_hashes = {}  # Digest of the last content per file, to skip identical re-writes
+        self.file_stats = {}  # (st_mtime_ns, st_size) when each file was last read
+
+        # Coalescing work queue: key -> (filename, content, last update). Files
+        # are keyed by name so a burst of rewrites collapses to the latest
+        # content; widget messages get unique keys and are never merged.
+        self.pending = {}
+        self.pending_cond = threading.Condition()
+        self.message_seq = itertools.count()
+
+        # inotify on the transcript dir; only writes after startup are seen,
+        # so older file contents are ignored without any mtime bookkeeping
+        self.poller = select.poll()
+        self.inotify_fd = _libc.inotify_init1(os.O_CLOEXEC | IN_NONBLOCK)
+        if self.inotify_fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.add_watch()
+        self.poller.register(self.inotify_fd, select.POLLIN)
+
+        # Optional message pipe from transcript-buttons, polled alongside inotify
+        self.send_fd = None
+        self.send_partial = b''
+        if os.environ.get(SEND_FD_ENV):
+            self.send_fd = int(os.environ[SEND_FD_ENV])
+            os.set_blocking(self.send_fd, False)
+            self.poller.register(self.send_fd, select.POLLIN)
+
+    def add_watch(self):
+        """Watch TRANSCRIPT_DIR for completed writes and renames into it"""
+        # IN_MODIFY is left out on purpose: it fires mid-write, on partial content
+        os.makedirs(TRANSCRIPT_DIR, exist_ok=True)
+        if _libc.inotify_add_watch(self.inotify_fd, TRANSCRIPT_DIR.encode(),
+                                   IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch {TRANSCRIPT_DIR} failed")
+
+    def read_events(self):
+        """Names of watched transcript files written since the last call"""
+        names = set()
+        while True:
+            try:
+                data = os.read(self.inotify_fd, 65536)
+            except BlockingIOError:
+                break  # Queue drained
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', errors='replace')
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped - check every file (content dedupe skips unchanged ones)
+                    print("[!] inotify queue overflow, rescanning transcripts")
+                    names.update(FILE_CONFIG)
+                elif mask & IN_IGNORED:
+                    # Watch removed (directory deleted) - recreate and watch again
+                    print(f"[!] {TRANSCRIPT_DIR} watch lost, re-adding")
+                    self.add_watch()
+                elif name in FILE_CONFIG:
+                    names.add(name)
+        return names
 
     def check_file(self, filename):
-        """Check if file has new content"""
+        """Read a file that was just written, None if unchanged or unreadable"""
         filepath = os.path.join(TRANSCRIPT_DIR, filename)
 
-        if not os.path.exists(filepath):
+        # Read content (raw unbuffered fd; one fstat decides whether to read at all)
+        try:
+            with open(filepath, 'rb', buffering=0) as f:
+                st = os.fstat(f.fileno())
+                stat_key = (st.st_mtime_ns, st.st_size)
+                if self.file_stats.get(filename) == stat_key:
+                    return None  # Untouched since last read (e.g. overflow rescan)
+                self.file_stats[filename] = stat_key
+
+                if st.st_size <= MMAP_THRESHOLD:
+                    raw = f.readall().strip()
+                    digest = hashlib.blake2s(raw, digest_size=16).digest()
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        # Same as .strip(), without copying the mapping
+                        start, end = 0, len(mm)
+                        while start < end and mm[start] in WHITESPACE:
+                            start += 1
+                        while end > start and mm[end - 1] in WHITESPACE:
+                            end -= 1
+                        with memoryview(mm) as view:
+                            digest = hashlib.blake2s(view[start:end], digest_size=16).digest()
+                        raw = None
+                        if self.file_hashes.get(filename) != digest:
+                            raw = mm[start:end]
+        except:
             return None
 
-        mtime = os.path.getmtime(filepath)
-
-        # Ignore files modified before listener started
-        if mtime < self.startup_time:
-            self.file_mtimes[filename] = mtime  # Track it so we catch future changes
+        # Check if content changed (by digest - no copy of the content is kept)
+        if self.file_hashes.get(filename) == digest:
             return None
 
-        # Check if file was modified since last check
-        if filename in self.file_mtimes:
-            if mtime <= self.file_mtimes[filename]:
-                return None
+        self.file_hashes[filename] = digest
+        return raw.decode('utf-8', errors='replace')
 
-        self.file_mtimes[filename] = mtime
-
-        # Read content
+    def read_messages(self):
+        """Return complete messages waiting on the input pipe"""
         try:
-            with open(filepath, 'r') as f:
-                content = f.read().strip()
-        except:
-            return None
-
-        # Check if content changed
-        if filename in self.file_contents:
-            if content == self.file_contents[filename]:
-                return None
+            chunk = os.read(self.send_fd, 65536)
+        except BlockingIOError:
+            return []
+        if not chunk:
+            # Widget closed its end - fall back to file watching only
+            self.poller.unregister(self.send_fd)
+            os.close(self.send_fd)
+            self.send_fd = None
+            return []
+        complete, sep, self.send_partial = (self.send_partial + chunk).rpartition(b'\n')
+        if not sep:
+            return []
+        # One JSON object per line: {"text": "..."} (content may span lines)
+        messages = []
+        for line in complete.split(b'\n'):
+            if not line.strip():
+                continue
+            try:
+                text = json.loads(line)["text"].strip()
+            except (ValueError, KeyError, TypeError, AttributeError):
+                print(f"[!] Bad message on input pipe: {line[:100]!r}")
+                continue
+            if text:
+                messages.append(text)
+        return messages
+
+    def _make_handler(self, filename, config):
+        """Handler callable for content written to filename"""
+        if filename == "capture.txt":
+            # Special handling for capture (VL model)
+            return self.agent_manager.handle_capture
+        if config.get("binary"):
+            return functools.partial(self.agent_manager.send_to_agent,
+                                     config["name"], log_path=config.get("log"))
+
+        def no_handler(content):
+            print(f"[*] {filename}: No handler configured")
+            print(f"    Content: {content[:100]}...")
+        return no_handler
+
+    def queue(self, key, filename, content):
+        """Queue content for dispatch, replacing anything still pending under key"""
+        with self.pending_cond:
+            self.pending[key] = (filename, content, time.monotonic())
+            self.pending_cond.notify()
+
+    def _next_ready(self):
+        """Pop the oldest entry that has been quiet for DEBOUNCE_SECS (lock held)"""
+        while True:
+            wait = None
+            now = time.monotonic()
+            for key, (filename, content, updated) in self.pending.items():
+                remaining = updated + DEBOUNCE_SECS - now
+                if remaining <= 0:
+                    del self.pending[key]
+                    return filename, content
+                wait = remaining if wait is None else min(wait, remaining)
+            self.pending_cond.wait(wait)
+
+    def dispatch_worker(self):
+        """Dispatch queued content one at a time; edits made meanwhile queue up again"""
+        while True:
+            with self.pending_cond:
+                filename, content = self._next_ready()
+            try:
+                self.dispatch(filename, content)
+            except Exception as e:
+                print(f"[!] Dispatch of {filename} failed: {e}")
+
+    def dispatch(self, filename, content):
+        """Route new content from a transcript file (or the input pipe)"""
+        # Check for [CLAUDE] flag - route to Claude Code instead of local LLM
+        use_claude = content.startswith("[CLAUDE]")
+        if use_claude:
+            content = content[8:].strip()  # Remove [CLAUDE] prefix
+            print("[*] Claude mode - routing to Claude Code CLI")
+            self.agent_manager.send_to_claude(content, filename)
+            return
 
-        self.file_contents[filename] = content
-        return content
+        self.handlers[filename](content)
 
     def watch(self):
         """Main watch loop - processes files in order: main -> coding -> capture"""
@@ -753,41 +1392,32 @@ class TranscriptWatcher:
         print(f"[*] Files (in order): {', '.join(f for f, _ in FILE_AGENTS)}")
         print(f"[*] Logs saved to: {LOG_DIR}")
         print(f"[*] OPTIMIZED MODE: LLM server and agents stay running")
+        if self.send_fd is not None:
+            print(f"[*] Reading widget messages from pipe (fd {self.send_fd})")
 
-        # Pre-start LLM server
-        self.agent_manager.ensure_llm_server()
+        # Pre-start LLM server and agents (before the worker, so nothing races them)
+        self.agent_manager.prewarm()
 
-        while True:
-            # Process files in order
-            for filename, config in FILE_AGENTS:
-                content = self.check_file(filename)
-
-                if content:
-                    print(f"\n[*] Detected change in {filename}")
-
-                    # Check for [CLAUDE] flag - route to Claude Code instead of local LLM
-                    use_claude = content.startswith("[CLAUDE]")
-                    if use_claude:
-                        content = content[8:].strip()  # Remove [CLAUDE] prefix
-                        print("[*] Claude mode - routing to Claude Code CLI")
-                        self.agent_manager.send_to_claude(content, filename)
-                        continue
-
-                    if filename == "capture.txt":
-                        # Special handling for capture (VL model)
-                        self.agent_manager.handle_capture(content)
-                    elif config.get("binary"):
-                        self.agent_manager.send_to_agent(
-                            config["name"],
-                            content,
-                            config.get("log")
-                        )
-                    else:
-                        print(f"[*] {filename}: No handler configured")
-                        print(f"    Content: {content[:100]}...")
-
-            time.sleep(1)
+        # Agents run on the dispatch worker so this loop keeps reading events
+        threading.Thread(target=self.dispatch_worker, daemon=True).start()
 
+        while True:
+            # Block until a transcript file is written or the widget sends something
+            for fd, _ in self.poller.poll():
+                if fd == self.inotify_fd:
+                    changed = self.read_events()
+                    # Process files in order
+                    for filename, _ in FILE_AGENTS:
+                        if filename not in changed:
+                            continue
+                        content = self.check_file(filename)
+                        if content:
+                            print(f"\n[*] Detected change in {filename}")
+                            self.queue(filename, filename, content)
+                elif fd == self.send_fd:
+                    for message in self.read_messages():
+                        print(f"\n[*] Received message from widget")
+                        self.queue(("pipe", next(self.message_seq)), "main.txt", message)
 
 def main():
     # Ensure single instance
@@ -795,7 +1425,9 @@ def main():
     print(f"[*] Lock acquired (PID: {os.getpid()})")
 
     os.makedirs(TRANSCRIPT_DIR, exist_ok=True)
-    os.makedirs(LOG_DIR, exist_ok=True)
+    os.makedirs(LOG_DIR, exist_ok=True)  # Holds every log file, so writers never need to create it
+    for log_path in (MAIN_LOG, CODING_LOG):
+        migrate_log(log_path)
 
     agent_manager = AgentManager()
     watcher = TranscriptWatcher(agent_manager)
@@ -808,7 +1440,7 @@ def main():
     finally:
         # Release lock
         fcntl.flock(lock_fd, fcntl.LOCK_UN)
-        lock_fd.close()
+        os.close(lock_fd)
 
 
 if __name__ == "__main__":